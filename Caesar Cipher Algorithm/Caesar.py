@@ -14,8 +14,6 @@
 # Versión: 1.0
 # -------------------------------------------------------------
 
-MAX_LENGTH = 1000
-
 # Alfabeto español en mayúsculas y minúsculas (incluye la Ñ, sin acentos)
 ALFABETO_MAY = [
     'A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M',
@@ -29,45 +27,43 @@ ALFABETO_MIN = [
 LONGITUD_ALFABETO = len(ALFABETO_MAY)  # 27
 
 
-def codificar_caracter(c):
-    # Tomamos un caracter c y devolvemos su posición en el alfabeto
-    if c in ALFABETO_MAY:
-        return ALFABETO_MAY.index(c)
-    if c in ALFABETO_MIN:
-        return ALFABETO_MIN.index(c)
-    return -1  # Si no está en el alfabeto, retornamos -1
+# Tablas de str.translate ya calculadas, una por desplazamiento (0-26).
+# Descifrar con la llave N es cifrar con 27 - N, así que las 27 tablas
+# cubren ambas direcciones.
+_TABLAS = {}
 
 
-def decodificar_posicion(pos, es_mayuscula):
-    if pos < 0 or pos >= LONGITUD_ALFABETO:
-        return 'error'
-    return ALFABETO_MAY[pos] if es_mayuscula else ALFABETO_MIN[pos]
+def tabla_cesar(desplazamiento):
+    # Tabla que manda cada letra a la que está 'desplazamiento' lugares
+    # después, respetando mayúsculas/minúsculas; lo demás queda igual
+    desplazamiento %= LONGITUD_ALFABETO
+    tabla = _TABLAS.get(desplazamiento)
+    if tabla is None:
+        origen = ''.join(ALFABETO_MAY) + ''.join(ALFABETO_MIN)
+        destino = ''.join(ALFABETO_MAY[desplazamiento:] + ALFABETO_MAY[:desplazamiento] +
+                          ALFABETO_MIN[desplazamiento:] + ALFABETO_MIN[:desplazamiento])
+        tabla = _TABLAS[desplazamiento] = str.maketrans(origen, destino)
+    return tabla
 
 
 def cifrar_cesar(texto, llave):
-    resultado = ""
-    for char in texto:
-        codificacion = codificar_caracter(char)
-        if codificacion != -1:
-            nueva_pos = (codificacion + llave) % LONGITUD_ALFABETO
-            es_mayus = char in ALFABETO_MAY
-            resultado += decodificar_posicion(nueva_pos, es_mayus)
-        else:
-            resultado += char
-    return resultado
+    return texto.translate(tabla_cesar(llave))
 
 
 def descifrar_cesar(texto, llave):
-    resultado = ""
-    for char in texto:
-        codificacion = codificar_caracter(char)
-        if codificacion != -1:
-            nueva_pos = (codificacion - llave + LONGITUD_ALFABETO) % LONGITUD_ALFABETO
-            es_mayus = char in ALFABETO_MAY
-            resultado += decodificar_posicion(nueva_pos, es_mayus)
-        else:
-            resultado += char
-    return resultado
+    return texto.translate(tabla_cesar(-llave))
+
+
+# Versiones por bloques para archivos grandes (ver flujo.py); César no
+# guarda estado entre bloques, así que cada uno se traduce por separado
+def cifrar_cesar_flujo(bloques, llave):
+    tabla = tabla_cesar(llave)
+    for bloque in bloques:
+        yield bloque.translate(tabla)
+
+
+def descifrar_cesar_flujo(bloques, llave):
+    return cifrar_cesar_flujo(bloques, -llave)
 
 
 def main():
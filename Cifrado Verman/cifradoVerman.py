@@ -15,24 +15,43 @@
 # -------------------------------------------------------------
 import random
 import string
+from itertools import islice
 
 def generar_clave(longitud):
     """Generar una clave pseudoaleatoria de longitud igual al mensaje, usando números entre 0 y 25 mod 26."""
     clave = [random.randint(0, 25) for _ in range(longitud)]
     return clave
 
+def base_letra(c):
+    """ord('a') u ord('A') si c es una letra de la a a la z; None si no es letra"""
+    if c in string.ascii_lowercase:
+        return ord('a')
+    if c in string.ascii_uppercase:
+        return ord('A')
+    return None
+
+def contar_letras(mensaje):
+    """Cuántos números de clave necesita el mensaje: uno por cada letra"""
+    return sum(1 for c in mensaje if base_letra(c) is not None)
+
 def cifrar_mensaje(mensaje, clave):
-    """Cifrar el mensaje usando la clave generada (mod 26)"""
+    """Cifrar el mensaje usando la clave generada (mod 26); lo que no es letra pasa igual y no usa clave"""
     mensaje_cifrado = []
-    for i in range(len(mensaje)):
+    i = 0
+    for c in mensaje:
+        base = base_letra(c)
+        if base is None:
+            mensaje_cifrado.append(c)
+            continue
         # Convertir cada letra del mensaje a su valor en el alfabeto (0-25)
-        valor_mensaje = ord(mensaje[i].lower()) - ord('a')
+        valor_mensaje = ord(c) - base
         
         # Realizar la operación de cifrado (suma modulo 26)
         valor_cifrado = (valor_mensaje + clave[i]) % 26
+        i += 1
         
-        # Convertir de nuevo al carácter cifrado (mantener minúsculas)
-        mensaje_cifrado.append(chr(valor_cifrado + ord('a')))
+        # Convertir de nuevo al carácter cifrado (mantener mayúsculas y minúsculas)
+        mensaje_cifrado.append(chr(valor_cifrado + base))
     
     return ''.join(mensaje_cifrado)
 
@@ -45,25 +64,61 @@ def guardar_archivo(mensaje_cifrado, clave, nombre_archivo):
 def recibir_archivo(nombre_archivo):
     """Recibir el archivo y leer el mensaje cifrado y la clave"""
     with open(nombre_archivo, 'r') as archivo:
-        mensaje_cifrado = archivo.readline().strip()
+        mensaje_cifrado = archivo.readline().rstrip('\n')
         clave = list(map(int, archivo.readline().strip().split(',')))
     return mensaje_cifrado, clave
 
 def descifrar_mensaje(mensaje_cifrado, clave):
-    """Descifrar el mensaje utilizando la clave (mod 26)"""
+    """Descifrar el mensaje utilizando la clave (mod 26); lo que no es letra pasa igual"""
     mensaje_descifrado = []
-    for i in range(len(mensaje_cifrado)):
+    i = 0
+    for c in mensaje_cifrado:
+        base = base_letra(c)
+        if base is None:
+            mensaje_descifrado.append(c)
+            continue
         # Convertir cada letra del mensaje cifrado a su valor en el alfabeto
-        valor_cifrado = ord(mensaje_cifrado[i].lower()) - ord('a')
+        valor_cifrado = ord(c) - base
         
         # Realizar la operación de descifrado (restar la clave y aplicar mod 26)
         valor_descifrado = (valor_cifrado - clave[i]) % 26
+        i += 1
         
-        # Convertir de nuevo al carácter descifrado (mantener minúsculas)
-        mensaje_descifrado.append(chr(valor_descifrado + ord('a')))
+        # Convertir de nuevo al carácter descifrado (mantener mayúsculas y minúsculas)
+        mensaje_descifrado.append(chr(valor_descifrado + base))
     
     return ''.join(mensaje_descifrado)
 
+# Versiones por bloques para archivos grandes (ver flujo.py)
+def cifrar_flujo(bloques):
+    """Cifrar un texto que llega por bloques; entrega pares (bloque cifrado, clave del bloque)"""
+    for bloque in bloques:
+        clave = generar_clave(contar_letras(bloque))
+        yield cifrar_mensaje(bloque, clave), clave
+
+def descifrar_flujo(bloques, claves):
+    """Descifrar por bloques; 'claves' es un iterador con la clave completa, número por número"""
+    for bloque in bloques:
+        letras = contar_letras(bloque)
+        clave = list(islice(claves, letras))
+        if len(clave) < letras:
+            raise ValueError("La clave es más corta que el mensaje.")
+        yield descifrar_mensaje(bloque, clave)
+
+def leer_clave(archivo, tamano=65536):
+    """Leer por bloques una clave guardada como números separados por comas"""
+    pendiente = ''
+    while True:
+        bloque = archivo.read(tamano)
+        if not bloque:
+            break
+        partes = (pendiente + bloque).split(',')
+        pendiente = partes.pop()  # el último número puede seguir en el siguiente bloque
+        for parte in partes:
+            yield int(parte)
+    if pendiente.strip():
+        yield int(pendiente)
+
 def eliminar_archivo(nombre_archivo):
     """Eliminar el archivo que contiene la clave"""
     import os
@@ -72,10 +127,10 @@ def eliminar_archivo(nombre_archivo):
 # Procedimiento principal
 def proceso_cifrado():
     # Paso 1: Recibir mensaje (M)
-    mensaje = input("Introduce el mensaje a cifrar (solo letras): ").lower()
+    mensaje = input("Introduce el mensaje a cifrar: ").lower()
     
-    # Paso 2: Calcular la longitud del mensaje
-    LM = len(mensaje)
+    # Paso 2: Calcular la longitud del mensaje (solo cuentan las letras)
+    LM = contar_letras(mensaje)
     
     # Paso 3: Generar clave K (números aleatorios mod 26)
     clave = generar_clave(LM)
@@ -102,4 +157,5 @@ def proceso_cifrado():
     print(f"El archivo {nombre_archivo} ha sido eliminado.")
 
 # Ejecutar el proceso
-proceso_cifrado()
+if __name__ == "__main__":
+    proceso_cifrado()
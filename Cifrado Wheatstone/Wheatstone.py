@@ -34,23 +34,41 @@ def encontrar_posicion(matriz, char):
                 return fila, col
     return None, None
 
+# Limpiar un pedazo del mensaje: minúsculas, 'j' como 'i' y solo letras
+def limpiar_texto(texto):
+    texto = texto.lower().replace('j', 'i')  # Tratar 'j' como 'i'
+    return ''.join([char for char in texto if char in string.ascii_lowercase])  # Mantener solo letras
+
+# Formar los pares de un mensaje que llega por bloques. La letra que queda
+# sin pareja al final de un bloque se guarda y se empareja en el siguiente.
+def pares_flujo(bloques):
+    pendiente = None
+    total = 0
+    for bloque in bloques:
+        letras = limpiar_texto(bloque)
+        total += len(letras)
+        for letra in letras:
+            if pendiente is None:
+                pendiente = letra
+            elif pendiente == letra:  # Insertar 'x' entre letras repetidas
+                yield pendiente + 'x'
+            else:
+                yield pendiente + letra
+                pendiente = None
+    if total % 2 != 0:  # Agregar 'x' si la longitud del mensaje es impar
+        if pendiente is None:
+            pendiente = 'x'
+        elif pendiente == 'x':
+            yield 'xx'
+        else:
+            yield pendiente + 'x'
+            pendiente = None
+    if pendiente is not None:  # Letra final sin pareja
+        yield pendiente + 'x'
+
 # Preprocesar el mensaje
 def preprocesar_mensaje(mensaje):
-    mensaje = mensaje.lower().replace('j', 'i')  # Tratar 'j' como 'i'
-    mensaje = ''.join([char for char in mensaje if char in string.ascii_lowercase])  # Mantener solo letras
-    mensaje = mensaje.replace(' ', '')  # Quitar espacios vacíos
-    if len(mensaje) % 2 != 0:  # Agregar 'x' si la longitud del mensaje es impar
-        mensaje += 'x'
-    pares = []
-    i = 0
-    while i < len(mensaje):
-        if i + 1 < len(mensaje) and mensaje[i] == mensaje[i + 1]:  # Insertar 'x' entre letras repetidas
-            pares.append(mensaje[i] + 'x')
-            i += 1
-        else:
-            pares.append(mensaje[i:i + 2])
-            i += 2
-    return pares
+    return list(pares_flujo([mensaje]))
 
 # Cifrar un par de letras
 def cifrar_par(par, matriz):
@@ -71,9 +89,21 @@ def cifrar_playfair(clave, mensaje):
     mensaje_cifrado = ''.join([cifrar_par(par, matriz) for par in pares])
     return mensaje_cifrado
 
-# Solicitar clave y mensaje de manera dinámica al usuario
-clave = input("Introduce la clave para el cifrado: ").lower()
-mensaje = input("Introduce el mensaje a cifrar: ").lower()
+# Cifrar un mensaje que llega por bloques (ver flujo.py)
+def cifrar_playfair_flujo(clave, bloques):
+    matriz = crear_matriz(clave)
+    pares = []
+    for par in pares_flujo(bloques):
+        pares.append(cifrar_par(par, matriz))
+        if len(pares) >= 4096:
+            yield ''.join(pares)
+            pares = []
+    yield ''.join(pares)
+
+if __name__ == "__main__":
+    # Solicitar clave y mensaje de manera dinámica al usuario
+    clave = input("Introduce la clave para el cifrado: ").lower()
+    mensaje = input("Introduce el mensaje a cifrar: ").lower()
 
-mensaje_cifrado = cifrar_playfair(clave, mensaje)
-print("\nMensaje Cifrado:\n", mensaje_cifrado,"\n")
+    mensaje_cifrado = cifrar_playfair(clave, mensaje)
+    print("\nMensaje Cifrado:\n", mensaje_cifrado,"\n")
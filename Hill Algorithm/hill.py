@@ -102,6 +102,34 @@ def hill_decrypt(ciphertext, key_matrix):
     return numbers_to_text(decrypted_blocks.T.flatten())
 
 
+#Versiones por bloques para archivos grandes (ver flujo.py). Las letras que no
+#completan un bloque de n se guardan y se juntan con las del siguiente pedazo.
+def hill_stream(chunks, matrix, n):
+    remainder = []
+    for chunk in chunks:
+        nums = remainder + text_to_numbers(chunk)
+        usable = len(nums) - len(nums) % n
+        remainder = nums[usable:]
+        if usable:
+            blocks = np.array(nums[:usable]).reshape(-1, n).T
+            yield numbers_to_text((np.dot(matrix, blocks) % 26).T.flatten())
+    return remainder
+
+def hill_encrypt_stream(chunks, key_matrix):
+    n = key_matrix.shape[0]
+    remainder = yield from hill_stream(chunks, key_matrix, n)
+    if remainder:
+        # Relleno con 'X' del último bloque
+        yield hill_encrypt(numbers_to_text(remainder), key_matrix)
+
+def hill_decrypt_stream(chunks, key_matrix):
+    n = key_matrix.shape[0]
+    key_matrix_inv = matrix_mod_inverse(key_matrix, 26)
+    remainder = yield from hill_stream(chunks, key_matrix_inv, n)
+    if remainder:
+        raise ValueError("Longitud del texto cifrado inválida para la matriz dada.")
+
+
 def main():
     print("=== CIFRADO HILL ===")
     key_matrix = None
@@ -1,23 +1,181 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
-from models import db, User, Vote
-from crypto_utils import CryptoManager
-from collections import Counter  
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify, make_response
+from flask import Response, stream_with_context
+from models import db, User, Vote, Tally, Election, SIGNATURE_BYTES, DEFAULT_ELECTION_ID
+from database import init_db
+from migrations import apply_migrations
+from crypto_utils import pubkey_fingerprint, ballot_message, new_ballot_nonce, signature_digest
+from elections import ElectionKeys, ElectionNotFound, require_election, create_election
+from audit import audit_votes
+from export import export_votes, FORMATS as EXPORT_FORMATS
+from tally import get_tally, rebuild_tally
+from merkle import current_state, inclusion_proof
+from pipeline import has_voted, claim_voter, deposit_ballot, VoteWriter, PipelineFull, PipelineTimeout
+from key_pool import KeyPool
+from metrics import Metrics
+from passwords import PasswordHasher, PasswordPoolBusy
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from sqlalchemy import and_, or_, false
+from sqlalchemy.exc import IntegrityError
 from Crypto.PublicKey import RSA 
+import click
+import hashlib
+import hmac
 import io
+import json
+import os
+import time
 
 
 app = Flask(__name__)
 app.secret_key = 'clave_secreta_para_sesion' # Necesario para mensajes flash
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///voting_system.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Marcas de agua de la reserva de factores de cegado
+app.config['BLINDING_POOL_LOW'] = 64
+app.config['BLINDING_POOL_HIGH'] = 256
+# H(m) del mensaje firmado: 'shake128' (512 bits) o 'fdh-shake256' (full-domain, |n|-1 bits).
+# Cambiarlo invalida las firmas que ya están en la urna: solo al iniciar una elección.
+app.config['BALLOT_HASH'] = 'shake128'
+app.config['BALLOT_HASH_CACHE'] = 4096
+# Reserva de llaves de usuario pre-generadas para /register
+app.config['KEY_POOL'] = True
+app.config['KEY_POOL_LOW'] = 16
+app.config['KEY_POOL_HIGH'] = 64
+app.config['KEY_POOL_WORKERS'] = 1
+# Máximo de votos cegados por petición en /sign_blinded_batch. Con contraseñas
+# caras el límite baja para que verificarlas tome a lo más ~SIGN_BATCH_PASSWORD_SECONDS
+app.config['SIGN_BATCH_MAX'] = 1000
+app.config['SIGN_BATCH_PASSWORD_SECONDS'] = 5.0
+# Tamaño de página del listado de votos
+app.config['VOTES_PAGE_SIZE'] = 100
+app.config['VOTES_PAGE_MAX'] = 500
+# Modo pipeline: los votos se guardan por lotes desde un hilo escritor
+app.config['VOTE_PIPELINE'] = True
+app.config['VOTE_PIPELINE_BATCH'] = 256
+app.config['VOTE_PIPELINE_QUEUE'] = 10000
+app.config['VOTE_PIPELINE_TIMEOUT'] = 30  # segundos esperando el commit del lote
+# Contraseñas: 'pbkdf2', 'scrypt' o 'argon2' (requiere argon2-cffi), en un pool de procesos.
+# PASSWORD_COST: iteraciones (pbkdf2), N (scrypt) o time_cost (argon2); None = valor por defecto.
+# Los hashes con otro esquema o costo se recalculan cuando el usuario entra.
+app.config['PASSWORD_HASH'] = 'pbkdf2'
+app.config['PASSWORD_COST'] = None
+app.config['PASSWORD_WORKERS'] = None  # por defecto, uno por núcleo
+app.config['PASSWORD_MAX_PENDING'] = 64
+# Métricas en /metrics; el perfilador por muestreo guarda las pilas de los requests más lentos
+app.config['METRICS'] = True
+app.config['METRICS_PROFILER'] = os.environ.get('VOTING_PROFILER') == '1'
+app.config['METRICS_PROFILER_INTERVAL'] = 0.005  # segundos entre muestras
+app.config['METRICS_PROFILER_KEEP'] = 20
 
-db.init_app(app)
-crypto = CryptoManager()
+init_db(app)
+
+# Las llaves del Admin (una por elección) viven en instance/ y se comparten entre todos los workers
+os.makedirs(app.instance_path, exist_ok=True)
+election_keys = ElectionKeys(os.path.join(app.instance_path, 'election_keys'),
+                             os.path.join(app.instance_path, 'admin_key.pem'),
+                             blinding_pool=(app.config['BLINDING_POOL_LOW'], app.config['BLINDING_POOL_HIGH']),
+                             hash_scheme=app.config['BALLOT_HASH'],
+                             hash_cache_size=app.config['BALLOT_HASH_CACHE'])
+# La elección general se carga desde el arranque
+election_keys.get(DEFAULT_ELECTION_ID)
 
 # Crear tablas al iniciar
 with app.app_context():
     db.create_all()
+    # create_all no modifica tablas que ya existían: eso lo hacen las migraciones
+    apply_migrations()
+    # Bases creadas antes de existir Tally: se reconstruye una sola vez
+    if Tally.query.first() is None and Vote.query.first() is not None:
+        rebuild_tally()
+
+key_pool = None
+if app.config['KEY_POOL']:
+    key_pool = KeyPool(app, os.path.join(app.instance_path, 'key_pool.key'),
+                       low=app.config['KEY_POOL_LOW'], high=app.config['KEY_POOL_HIGH'],
+                       workers=app.config['KEY_POOL_WORKERS'])
+
+# Parámetros públicos (n, e) de cada elección: no cambian mientras corre el servidor
+_public_params_cache = {}  # election_id -> (json, etag)
+
+def _public_params(election):
+    cached = _public_params_cache.get(election.id)
+    if cached is None:
+        crypto = election_keys.get(election.id)
+        n, e = crypto.get_admin_pub_params()
+        body = json.dumps({'election': election.slug, 'n': str(n), 'e': str(e), 'hash': crypto.hasher.name})
+        cached = _public_params_cache[election.id] = (body, hashlib.sha256(body.encode()).hexdigest()[:32])
+    return cached
+
+vote_writer = None
+if app.config['VOTE_PIPELINE']:
+    vote_writer = VoteWriter(app, batch_size=app.config['VOTE_PIPELINE_BATCH'],
+                             max_queue=app.config['VOTE_PIPELINE_QUEUE'])
+
+passwords = PasswordHasher(app.config['PASSWORD_HASH'], cost=app.config['PASSWORD_COST'],
+                           workers=app.config['PASSWORD_WORKERS'],
+                           max_pending=app.config['PASSWORD_MAX_PENDING'])
+
+import_rsa_key = RSA.import_key
+
+metrics = None
+if app.config['METRICS']:
+    metrics = Metrics(app, db, profiler=app.config['METRICS_PROFILER'],
+                      profiler_interval=app.config['METRICS_PROFILER_INTERVAL'],
+                      profiler_keep=app.config['METRICS_PROFILER_KEEP'])
+    election_keys.on_load(lambda crypto: metrics.instrument(
+        crypto, ['hash_msg', 'blind_message', 'sign_blinded', 'sign_blinded_many',
+                 'unblind_signature', 'verify_signature', 'generate_user_keys']))
+    if key_pool:
+        metrics.instrument(key_pool, ['take'], prefix='key_pool.')
+    metrics.instrument(passwords, ['hash', 'hash_many', 'verify', 'verify_many'], prefix='password.')
+    import_rsa_key = metrics.timed('rsa_import_key')(RSA.import_key)
+
+    metrics.gauge('blinding_pool_depth', 'Factores de cegado listos (todas las elecciones).',
+                  lambda: sum(crypto.blinding_pool.stats()['depth']
+                              for crypto in election_keys.loaded().values() if crypto.blinding_pool))
+    if key_pool:
+        metrics.gauge('key_pool_depth', 'Llaves de usuario pre-generadas.', lambda: key_pool.stats()['depth'])
+    if vote_writer:
+        metrics.gauge('vote_writer_queue', 'Votos esperando al hilo escritor.', lambda: vote_writer.stats()['queued'])
+
+def _check_password(user, password):
+    """
+    Verifica la contraseña en el pool de procesos. Si el hash guardado usa otro
+    esquema o costo se recalcula aquí (queda en la sesión; lo guarda el commit del request).
+    """
+    if user is None:
+        return False
+    ok, needs_rehash = passwords.verify(user.password, password)
+    if ok and needs_rehash:
+        user.password = passwords.hash(password)
+    return ok
+
+def _back_to_form():
+    """
+    Redirección para errores de peticiones HTML: a la cabina si venía de ahí,
+    si no al inicio (request.path no sirve: /register solo acepta POST).
+    """
+    return redirect(url_for('voting_booth') if request.endpoint == 'voting_booth' else url_for('index'))
+
+# Rutas que leen programas (client.py, loadtest.py, el JavaScript de results.html):
+# sus errores van en JSON aunque la petición sea un GET sin cuerpo
+API_ENDPOINTS = {'public_params', 'sign_blinded', 'vote', 'sign_blinded_batch', 'votes_json', 'votes_rows',
+                 'merkle_root', 'merkle_proof', 'elections_json'}
+
+@app.errorhandler(ElectionNotFound)
+def election_not_found(exc):
+    if request.is_json or request.endpoint in API_ENDPOINTS:
+        return jsonify({'error': 'Elección no encontrada.'}), 404
+    flash('Error: La elección indicada no existe.')
+    return _back_to_form()
+
+@app.errorhandler(PasswordPoolBusy)
+def password_pool_busy(exc):
+    db.session.rollback()
+    if request.is_json:
+        return jsonify({'error': 'El sistema está saturado, intente de nuevo.'}), 503
+    flash('Error: El sistema está saturado, intente de nuevo en unos segundos.')
+    return _back_to_form()
 
 # --- RUTAS DEL FRONTEND ---
 
@@ -28,21 +186,43 @@ def index():
 
 @app.route('/register', methods=['POST'])
 def register():
-    username = request.form['username']
-    password = request.form['password']
+    # Acepta el formulario HTML o JSON (client.py)
+    data = request.get_json(silent=True) if request.is_json else request.form
+    username = (data or {}).get('username', '')
+    password = (data or {}).get('password', '')
+    if request.is_json and (not username or not password):
+        return jsonify({'error': 'Se requieren username y password.'}), 400
 
     if User.query.filter_by(username=username).first():
+        if request.is_json:
+            return jsonify({'error': 'El usuario ya existe.'}), 409
         flash('El usuario ya existe.')
         return redirect(url_for('index'))
 
-    # Generar llaves
-    priv_pem, pub_pem = crypto.generate_user_keys()
+    # AHORA (Encriptamos antes de guardar). Va antes de tomar la llave: el hash
+    # es lento y take() ya abre la transacción de escritura
+    hashed_pw = passwords.hash(password)
+
+    # Tomar llaves de la reserva (o generarlas si está vacía). La llave se
+    # consume en el mismo commit que crea al usuario
+    keys = key_pool.take() if key_pool else None
+    priv_pem, pub_pem, fingerprint = keys or election_keys.get(DEFAULT_ELECTION_ID).generate_user_keys()
 
-    # AHORA (Encriptamos antes de guardar):
-    hashed_pw = generate_password_hash(password, method='pbkdf2:sha256')
-    new_user = User(username=username, password=hashed_pw, public_key_pem=pub_pem.decode())
+    new_user = User(username=username, password=hashed_pw, public_key_pem=pub_pem.decode(),
+                    pubkey_fingerprint=fingerprint)
     db.session.add(new_user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otro request registró el mismo usuario: el rollback devuelve la llave a la reserva
+        db.session.rollback()
+        if request.is_json:
+            return jsonify({'error': 'El usuario ya existe.'}), 409
+        flash('El usuario ya existe.')
+        return redirect(url_for('index'))
+
+    if request.is_json:
+        return jsonify({'username': username, 'private_key_pem': priv_pem.decode()})
 
     # Descargar llave privada automáticamente
     return send_file(
@@ -57,7 +237,12 @@ def voting_booth():
     if request.method == 'POST':
         username = request.form['username'].strip()
         password = request.form['password'].strip()
-        vote_content = request.form['vote']
+        # La opción viene como "<id de elección>:<candidato>"
+        election_ref, _, vote_content = request.form['vote'].partition(':')
+        election = require_election(election_ref)
+        if vote_content not in election.candidate_list:
+            flash('Error: Candidato inválido para esta elección.')
+            return redirect(url_for('voting_booth'))
         
         # 1. RECIBIR EL ARCHIVO DE LA LLAVE
         uploaded_file = request.files['key_file']
@@ -68,13 +253,13 @@ def voting_booth():
         # 2. AUTENTICACIÓN BÁSICA (Password)
         user = User.query.filter_by(username=username).first()
         
-        # AHORA (Usamos la función de chequeo seguro):
-        if not user or not check_password_hash(user.password, password):
+        # AHORA (Usamos la función de chequeo seguro, fuera del hilo del request):
+        if not _check_password(user, password):
             flash('Error: Credenciales incorrectas.')
             return redirect(url_for('voting_booth'))
         
-        if user.has_voted:
-            flash('Error: Usted YA ha votado.')
+        if has_voted(election.id, user.id):
+            flash('Error: Usted YA ha votado en esta elección.')
             return redirect(url_for('voting_booth'))
 
         # 3. VALIDACIÓN CRIPTOGRÁFICA (LA LLAVE PRIVADA)
@@ -83,17 +268,14 @@ def voting_booth():
             key_data = uploaded_file.read()
             
             # Intentamos importar la llave privada con PyCryptodome
-            user_private_key_obj = RSA.import_key(key_data)
-            
-            # Derivamos la pública de la privada que subió el usuario
-            user_public_key_derived = user_private_key_obj.publickey().export_key().decode()
+            user_private_key_obj = import_rsa_key(key_data)
+            if not user_private_key_obj.has_private():
+                raise ValueError('Se subió una llave pública, no la privada.')
             
-            # Comparamos con la pública que tenemos guardada en la Base de Datos
-            # Limpiamos espacios por si acaso (.strip())
-            stored_pub = user.public_key_pem.strip()
-            uploaded_pub = user_public_key_derived.strip()
+            # Comparamos la huella (n, e) de la llave subida con la guardada en la BD
+            uploaded_fp = pubkey_fingerprint(user_private_key_obj)
 
-            if stored_pub != uploaded_pub:
+            if not hmac.compare_digest(uploaded_fp, user.pubkey_fingerprint or b''):
                 flash('ERROR CRÍTICO: Esta llave privada NO PERTENECE al usuario indicado.')
                 return redirect(url_for('voting_booth'))
 
@@ -104,40 +286,369 @@ def voting_booth():
 
         # --- SI LLEGA AQUÍ, EL USUARIO ES QUIEN DICE SER (TIENE LA LLAVE) ---
 
-        # LOGICA DE CEGADO 
+        # LOGICA DE CEGADO (con la llave de la elección)
+        crypto = election_keys.get(election.id)
         n, e = crypto.get_admin_pub_params()
-        blinded_val, r = crypto.blind_message(vote_content, n, e)
+        nonce = new_ballot_nonce()
+        blinded_val, r = crypto.blind_message(ballot_message(vote_content, nonce), n, e)
 
         # FIRMA CIEGA
         blinded_signature = crypto.sign_blinded(blinded_val)
-        user.has_voted = True
-        db.session.commit()
 
-        # DESCEGADO Y DEPOSITO
+        # DESCEGADO Y DEPOSITO (marca de votante + voto en una sola transacción)
         real_signature = crypto.unblind_signature(blinded_signature, r, n)
-        new_vote = Vote(vote_content=vote_content, signature=str(real_signature))
-        db.session.add(new_vote)
+        user_id, election_id = user.id, election.id
+        # Cerramos la transacción (guarda un posible rehash) para no bloquear al hilo escritor
         db.session.commit()
+        try:
+            vote_id = _submit_ballot(election_id, user_id, vote_content, real_signature, nonce)
+        except PipelineFull:
+            flash('Error: El sistema está saturado, intente de nuevo en unos segundos.')
+            return redirect(url_for('voting_booth'))
+        except PipelineTimeout:
+            flash('El sistema está saturado y su voto aún no se confirma; puede quedar registrado '
+                  'en unos segundos. Busque su recibo en Resultados antes de intentar de nuevo. '
+                  f'Recibo: {real_signature}')
+            return redirect(url_for('voting_booth'))
+
+        if vote_id is None:
+            flash('Error: Usted YA ha votado en esta elección.')
+            return redirect(url_for('voting_booth'))
+
+        return render_template('success.html', signature=str(real_signature), vote_id=vote_id, election=election)
+
+    return render_template('vote.html', elections=Election.query.order_by(Election.id).all())
+
+def _submit_ballot(election_id, user_id, vote_content, signature, nonce):
+    """
+    Deposita un voto (por el pipeline si está activo). Devuelve el id del voto
+    o None como deposit_ballot; lanza PipelineFull si la cola está llena y
+    PipelineTimeout si el lote no terminó a tiempo (el voto sigue en la cola)
+    o si el hilo escritor no pudo guardarlo.
+    """
+    if vote_writer is not None:
+        future = vote_writer.submit(election_id, user_id, vote_content, signature, nonce)
+        try:
+            return future.result(timeout=app.config['VOTE_PIPELINE_TIMEOUT'])
+        except FutureTimeoutError:
+            raise PipelineTimeout('El lote del voto no terminó a tiempo.')
+        except Exception as exc:
+            # Ej. "database is locked": el votante puede reintentar con la misma firma
+            app.logger.exception('El hilo escritor no pudo guardar el voto')
+            raise PipelineTimeout('No se pudo guardar el voto.') from exc
+    vote_id = deposit_ballot(election_id, user_id, vote_content, signature, nonce)
+    db.session.commit()
+    return vote_id
+
+# --- API JSON (flujo de cegado del lado del cliente, ver client.py) ---
+
+@app.route('/public_params')
+def public_params():
+    """(n, e) del Admin de la elección (?election=) para que el cliente ciegue su voto"""
+    body, etag = _public_params(require_election(request.args.get('election')))
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+        response.mimetype = 'application/json'
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response
 
-        return render_template('success.html', signature=str(real_signature))
+@app.route('/sign_blinded', methods=['POST'])
+def sign_blinded():
+    """
+    Firma ciega: el servidor autentica al votante y firma H(voto)*r^e
+    sin ver el voto. El votante queda marcado en ese momento (solo para esa elección).
+    """
+    data = request.get_json(silent=True) or {}
+    election = require_election(data.get('election'))
+    crypto = election_keys.get(election.id)
+    n, _ = crypto.get_admin_pub_params()
+    username = str(data.get('username', '')).strip()
+    password = str(data.get('password', '')).strip()
+    try:
+        blinded_val = int(data.get('blinded_hash'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Valor cegado inválido.'}), 400
+    if not 0 < blinded_val < n:
+        return jsonify({'error': 'Valor cegado fuera de rango.'}), 400
 
-    return render_template('vote.html')
+    user = User.query.filter_by(username=username).first()
+    if not _check_password(user, password):
+        return jsonify({'error': 'Credenciales incorrectas.'}), 401
+
+    if not claim_voter(election.id, user.id):
+        db.session.rollback()
+        return jsonify({'error': 'Usted YA ha votado en esta elección.'}), 409
+
+    blinded_signature = crypto.sign_blinded(blinded_val)
+    db.session.commit()
+    return jsonify({'blind_signature': str(blinded_signature)})
+
+@app.route('/vote', methods=['POST'])
+def vote():
+    """
+    Urna anónima: recibe (voto, firma descegada) sin ningún dato del usuario
+    y solo acepta el voto si la firma del Admin de la elección es válida.
+    """
+    data = request.get_json(silent=True) or {}
+    election = require_election(data.get('election'))
+    crypto = election_keys.get(election.id)
+    admin_n, admin_e = crypto.get_admin_pub_params()
+    vote_content = str(data.get('vote', '')).strip()
+    nonce = str(data.get('nonce', '')).strip().lower()
+    try:
+        signature = int(data.get('signature'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Firma inválida.'}), 400
+    if not vote_content or not 0 < signature < admin_n:
+        return jsonify({'error': 'Voto o firma inválidos.'}), 400
+    if vote_content not in election.candidate_list:
+        return jsonify({'error': 'Candidato inválido para esta elección.'}), 400
+    if not 16 <= len(nonce) <= 64 or any(c not in '0123456789abcdef' for c in nonce):
+        return jsonify({'error': 'Número de serie (nonce) inválido.'}), 400
+
+    message = ballot_message(vote_content, nonce)
+    if not crypto.verify_signature(message, signature, admin_n, admin_e):
+        return jsonify({'error': 'La firma no corresponde al voto.'}), 400
+
+    try:
+        vote_id = _submit_ballot(election.id, None, vote_content, signature, nonce)
+    except PipelineFull:
+        return jsonify({'error': 'El sistema está saturado, intente de nuevo.'}), 503
+    except PipelineTimeout:
+        # Reintentar con la misma firma es seguro: si ya se guardó, responde 409
+        return jsonify({'error': 'El sistema está saturado; su voto aún no se confirma y puede quedar '
+                                 'registrado. Busque su firma (recibo) en /votes antes de reintentar.',
+                        'pending': True, 'signature': str(signature)}), 503
+    if vote_id is None:
+        return jsonify({'error': 'Esta firma ya fue depositada en la urna.'}), 409
+    return jsonify({'status': 'ok', 'message': 'Voto depositado en la urna.', 'signature': str(signature),
+                    'vote_id': vote_id, 'proof_url': url_for('merkle_proof', vote_id=vote_id)})
+
+def _sign_batch_max():
+    """SIGN_BATCH_MAX, o menos si con el costo actual el lote tardaría en verificarse"""
+    per_second = passwords.workers / passwords.hash_seconds()
+    budget = int(app.config['SIGN_BATCH_PASSWORD_SECONDS'] * per_second)
+    return max(1, min(app.config['SIGN_BATCH_MAX'], budget))
+
+@app.route('/sign_blinded_batch', methods=['POST'])
+def sign_blinded_batch():
+    """
+    API para kioscos y pruebas de carga: firma muchos votos cegados en una
+    sola petición. Cada entrada trae sus credenciales y su 'blinded_hash';
+    todo el lote es para la misma elección.
+    """
+    data = request.get_json(silent=True) or {}
+    election = require_election(data.get('election'))
+    crypto = election_keys.get(election.id)
+    entries = data.get('requests')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': "Se esperaba una lista 'requests'."}), 400
+    limit = _sign_batch_max()
+    if len(entries) > limit:
+        return jsonify({'error': 'Lote demasiado grande.', 'max': limit}), 413
+
+    n, _ = crypto.get_admin_pub_params()
+    results = [None] * len(entries)
+    pending = []     # (índice, usuario, valor cegado, contraseña)
+    authorized = []  # (índice, usuario, valor cegado)
+
+    for i, entry in enumerate(entries):
+        entry = entry if isinstance(entry, dict) else {}
+        username = str(entry.get('username', '')).strip()
+        password = str(entry.get('password', '')).strip()
+        try:
+            blinded_val = int(entry.get('blinded_hash'))
+        except (TypeError, ValueError):
+            results[i] = {'username': username, 'error': 'Valor cegado inválido.'}
+            continue
+        if not 0 < blinded_val < n:
+            results[i] = {'username': username, 'error': 'Valor cegado fuera de rango.'}
+            continue
+
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            results[i] = {'username': username, 'error': 'Credenciales incorrectas.'}
+            continue
+        pending.append((i, user, blinded_val, password))
+
+    # Las contraseñas del lote se verifican en paralelo en el pool de procesos
+    checks = passwords.verify_many([(user.password, password) for _, user, _, password in pending])
+    rehash = []
+    for (i, user, blinded_val, password), (ok, needs_rehash) in zip(pending, checks):
+        if not ok:
+            results[i] = {'username': user.username, 'error': 'Credenciales incorrectas.'}
+            continue
+        if needs_rehash:
+            rehash.append((user, password))
+        authorized.append((i, user, blinded_val))
+
+    # Todo lo lento (rehash y FIRMA CIEGA EN PARALELO) va antes de marcar votantes:
+    # el primer INSERT toma el candado de escritura de SQLite hasta el commit
+    new_hashes = passwords.hash_many([password for _, password in rehash])
+    signatures = crypto.sign_blinded_many([val for _, _, val in authorized])
+
+    for (user, _), new_hash in zip(rehash, new_hashes):
+        user.password = new_hash
+    for (i, user, _), s_blinded in zip(authorized, signatures):
+        # INSERT sin conflicto: también cubre al mismo usuario repetido en el lote.
+        # Una firma solo se entrega si el votante quedó marcado
+        if not claim_voter(election.id, user.id):
+            results[i] = {'username': user.username, 'error': 'Usted YA ha votado en esta elección.'}
+            continue
+        results[i] = {'username': user.username, 'blind_signature': str(s_blinded)}
+    db.session.commit()
+
+    return jsonify({'results': results})
+
+@app.route('/stats/pools')
+def pool_stats():
+    """Profundidad y aciertos de las reservas precalculadas"""
+    managers = election_keys.loaded()
+    return jsonify({
+        'blinding': {election_id: crypto.blinding_pool.stats() if crypto.blinding_pool else None
+                     for election_id, crypto in managers.items()},
+        'hash_cache': {election_id: crypto.hasher.cache_info() for election_id, crypto in managers.items()},
+        'user_keys': key_pool.stats() if key_pool else None,
+        'vote_writer': vote_writer.stats() if vote_writer else None,
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    if metrics is None:
+        return jsonify({'error': 'Las métricas están desactivadas.'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/slowest')
+def slowest_requests():
+    """Pilas (formato folded) de los requests más lentos: flamegraph.pl o speedscope"""
+    if metrics is None or metrics.profiler is None:
+        return jsonify({'error': 'El perfilador está desactivado (VOTING_PROFILER=1).'}), 404
+    return Response(metrics.profiler.folded(), mimetype='text/plain')
 
 @app.route('/results')
 def results():
-    votes = Vote.query.all()
+    # Conteo incremental de la elección (Ej: ['Alianza Java', 'Partido Python'], [3, 5])
+    # Los votos se cargan aparte y por páginas desde /votes/rows
+    election = require_election(request.args.get('election'))
+    labels, values = get_tally(election.id)
+
+    return render_template('results.html', labels=labels, values=values, election=election,
+                           elections=Election.query.order_by(Election.id).all())
+
+def _votes_page():
+    """
+    Página de votos de una elección por keyset (id > after), opcionalmente
+    filtrada por candidato exacto o por firma completa (recibo).
+    Devuelve (votos, siguiente_after, búsqueda), donde búsqueda es None sin
+    filtro, o {'match': 'candidate', 'count': total} / {'match': 'signature'}.
+    """
+    election = require_election(request.args.get('election'))
+    after = request.args.get('after', 0, type=int)
+    limit = request.args.get('limit', app.config['VOTES_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['VOTES_PAGE_MAX']))
+    q = request.args.get('q', '').strip()
+
+    query = Vote.query.filter(Vote.election_id == election.id, Vote.id > after)
+    search = None
+    if q:
+        tally = db.session.get(Tally, (election.id, q))
+        if tally is not None:
+            query = query.filter(Vote.vote_content == q)
+            search = {'match': 'candidate', 'count': tally.count}
+        elif q.isascii() and q.isdigit() and int(q).bit_length() <= SIGNATURE_BYTES * 8:
+            # El recibo se busca por el índice de firmas gastadas; los votos
+            # antiguos (sin signature_hash) se comparan en binario
+            query = query.filter(or_(
+                Vote.signature_hash == signature_digest(q),
+                and_(Vote.signature_hash.is_(None), Vote.signature == Vote.pack_signature(q)),
+            ))
+            search = {'match': 'signature'}
+        else:
+            query = query.filter(false())
+
+    votes = query.order_by(Vote.id).limit(limit + 1).all()
+    next_after = votes[limit - 1].id if len(votes) > limit else None
+    return votes[:limit], next_after, search
+
+@app.route('/votes')
+def votes_json():
+    votes, next_after, search = _votes_page()
+    return jsonify({
+        'votes': [{'id': v.id, 'vote_content': v.vote_content, 'nonce': v.nonce, 'signature': v.signature_str}
+                  for v in votes],
+        'next_after': next_after,
+        'search': search,
+    })
+
+@app.route('/votes/rows')
+def votes_rows():
+    """Fragmento HTML (<tr>) que results.html agrega al hacer scroll"""
+    votes, next_after, search = _votes_page()
+    response = make_response(render_template('_vote_rows.html', votes=votes))
+    response.headers['X-Next-After'] = '' if next_after is None else str(next_after)
+    # Qué encontró la búsqueda, para que la página no confunda un candidato con un recibo
+    if search:
+        response.headers['X-Search-Match'] = search['match']
+        if 'count' in search:
+            response.headers['X-Search-Count'] = str(search['count'])
+    return response
 
-    # 1. Extraer solo los nombres de los candidatos de los votos
-    vote_names = [v.vote_content for v in votes]
+@app.route('/merkle_root')
+def merkle_root():
+    """Raíz publicada del árbol de Merkle de la urna de una elección"""
+    election = require_election(request.args.get('election'))
+    size, root = current_state(election.id)
+    return jsonify({'election': election.slug, 'size': size, 'root': root.hex()})
 
-    # 2. Contar frecuencia (Ej: {'Partido Python': 5, 'Alianza Java': 3})
-    vote_counts = Counter(vote_names)
+@app.route('/proof/<int:vote_id>')
+def merkle_proof(vote_id):
+    """
+    Prueba de inclusión del voto: O(log n) hashes que llevan de su hoja a la
+    raíz publicada (verificable con merkle.verify_inclusion).
+    """
+    vote = db.session.get(Vote, vote_id)
+    if vote is None or vote.merkle_index is None:
+        return jsonify({'error': 'Voto no encontrado.'}), 404
+    leaf, path, size, root = inclusion_proof(vote.election_id, vote.merkle_index)
+    return jsonify({
+        'vote_id': vote.id,
+        'election_id': vote.election_id,
+        'vote_content': vote.vote_content,
+        'nonce': vote.nonce,
+        'signature': vote.signature_str,
+        'leaf_index': vote.merkle_index,
+        'leaf_hash': leaf.hex(),
+        'tree_size': size,
+        'root': root.hex(),
+        'path': [node.hex() for node in path],
+    })
 
-    # 3. Separar en dos listas para la gráfica
-    labels = list(vote_counts.keys())   # Nombres
-    values = list(vote_counts.values()) # Cantidades
+@app.route('/export')
+def export():
+    """Descarga la urna completa de una elección (gzip) para verificación independiente"""
+    election = require_election(request.args.get('election'))
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Formato no soportado. Use: {", ".join(EXPORT_FORMATS)}.'}), 400
 
-    return render_template('results.html', votes=votes, labels=labels, values=values)
+    stream = stream_with_context(export_votes(election_keys.get(election.id), election, fmt))
+    return Response(stream, mimetype='application/gzip', headers={
+        'Content-Disposition': f'attachment; filename=urna-{election.slug}.{fmt}.gz',
+    })
+
+@app.route('/elections')
+def elections_json():
+    """Elecciones disponibles con sus candidatos"""
+    return jsonify({'elections': [
+        {'id': election.id, 'slug': election.slug, 'title': election.title,
+         'candidates': election.candidate_list}
+        for election in Election.query.order_by(Election.id)
+    ]})
 
 @app.route('/credits')
 def credits_page():
@@ -147,6 +658,84 @@ def credits_page():
 def how_it_works():
     return render_template('how_it_works.html')
 
+# --- COMANDOS DE ADMINISTRACIÓN (flask --app app <comando>) ---
+
+@app.cli.command('audit')
+@click.option('--election', 'election_ref', default=None, help='Id o slug (por defecto, todas).')
+@click.option('--chunk-size', default=5000, show_default=True, help='Votos por bloque.')
+@click.option('--workers', default=None, type=int, help='Procesos verificadores (por defecto, uno por núcleo).')
+def audit_command(election_ref, chunk_size, workers):
+    """Verifica la firma del Admin en cada voto de la urna."""
+    if election_ref is None:
+        elections = Election.query.order_by(Election.id).all()
+    else:
+        elections = [require_election(election_ref)]
+    for election in elections:
+        report = audit_votes(election_keys.get(election.id), election.id,
+                             chunk_size=chunk_size, workers=workers)
+        click.echo(f"[{election.slug}] Votos auditados: {report['total']} ({report['candidates']} candidatos)")
+        click.echo(f"Válidos: {report['valid']}  Inválidos: {report['invalid']}")
+        if report['invalid_ids']:
+            click.echo(f"Ids inválidos (primeros {len(report['invalid_ids'])}): {report['invalid_ids']}")
+        click.echo(f"Tiempo: {report['seconds']:.2f} s  ({report['votes_per_second']:.0f} votos/s)")
+
+@app.cli.command('export')
+@click.option('--election', 'election_ref', default=None, help='Id o slug (por defecto, la general).')
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='jsonl', show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None,
+              help='Archivo de salida (por defecto urna-<elección>.<formato>.gz).')
+def export_command(election_ref, fmt, output):
+    """Exporta la urna comprimida con gzip, con (n, e) para verificarla."""
+    election = require_election(election_ref)
+    output = output or f'urna-{election.slug}.{fmt}.gz'
+    with open(output, 'wb') as f:
+        for chunk in export_votes(election_keys.get(election.id), election, fmt):
+            f.write(chunk)
+    click.echo(f'Urna exportada en {output}')
+
+@app.cli.command('create-election')
+@click.argument('slug')
+@click.option('--title', required=True, help='Nombre visible de la elección.')
+@click.option('--candidate', 'candidates', multiple=True, required=True, help='Repetir por cada candidato.')
+def create_election_command(slug, title, candidates):
+    """Crea una elección nueva con su propia llave de firma."""
+    election = create_election(slug, title, candidates)
+    # Generamos la llave de una vez para no hacerlo en el primer request
+    election_keys.get(election.id)
+    click.echo(f'Elección {election.slug} creada (id {election.id}), llave en {election_keys.key_path(election.id)}')
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Aplica las migraciones de esquema pendientes."""
+    applied = apply_migrations()
+    click.echo(f'Migraciones aplicadas: {applied}')
+
+@app.cli.command('rebuild-tally')
+def rebuild_tally_command():
+    """Reconstruye el conteo por candidato a partir de la tabla Vote."""
+    mismatches = rebuild_tally()
+    if not mismatches:
+        click.echo('El conteo ya coincidía con la urna.')
+    for (election_id, candidate), (before, after) in sorted(mismatches.items()):
+        click.echo(f'[{election_id}] {candidate}: {before} -> {after}')
+
+@app.cli.command('password-benchmark')
+@click.option('--cost', default=None, type=int, help='Costo a medir (por defecto, PASSWORD_COST).')
+@click.option('--logins', default=64, show_default=True, help='Verificaciones simultáneas.')
+def password_benchmark_command(cost, logins):
+    """Mide cuántos logins por segundo soporta el pool con un costo dado."""
+    hasher = PasswordHasher(passwords.backend, cost=cost or passwords.cost,
+                            workers=app.config['PASSWORD_WORKERS'], max_pending=max(logins, 1))
+    try:
+        stored = hasher.hash('benchmark')
+        start = time.perf_counter()
+        hasher.verify_many([(stored, 'benchmark')] * logins)
+        elapsed = time.perf_counter() - start
+    finally:
+        hasher.shutdown()
+    click.echo(f'{hasher.backend} costo={hasher.cost}: {logins} logins en {elapsed:.2f} s '
+               f'({logins / elapsed:.1f} logins/s)')
+
 if __name__ == '__main__':
 
     app.run(debug=True, port=5000)
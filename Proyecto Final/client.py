@@ -1,6 +1,6 @@
 import requests
-import json
-from crypto_utils import CryptoManager
+from crypto_utils import CryptoManager, ballot_message, new_ballot_nonce
+from merkle import ballot_leaf, verify_inclusion
 
 # Usamos CryptoManager solo para las funciones matemáticas de ayuda (blinding/unblinding)
 # pero simulamos que las llaves son del cliente.
@@ -8,7 +8,75 @@ helper = CryptoManager()
 
 BASE_URL = "http://127.0.0.1:5000"
 
+# --- Llamadas a la API (reutilizadas por loadtest.py) ---
+# Reciben una requests.Session para reutilizar conexiones.
+
+def register(session, user, pwd, base_url=BASE_URL):
+    return session.post(f"{base_url}/register", json={'username': user, 'password': pwd})
+
+# 'election' es el id o slug de la elección; None = la elección general
+
+def get_elections(session, base_url=BASE_URL):
+    """Elecciones abiertas con sus candidatos (la general primero)"""
+    return session.get(f"{base_url}/elections").json()['elections']
+
+def find_election(elections, ref=None):
+    """Busca por id o slug en la lista de get_elections; None = la general"""
+    if ref is None:
+        return elections[0] if elections else None
+    for election in elections:
+        if str(ref) in (str(election['id']), election['slug']):
+            return election
+    return None
+
+def choose_from(prompt, options):
+    """Pide una opción por número o por nombre exacto hasta que sea válida"""
+    for i, option in enumerate(options, 1):
+        print(f"  {i}. {option}")
+    while True:
+        choice = input(prompt).strip()
+        if choice.isdigit() and 1 <= int(choice) <= len(options):
+            return options[int(choice) - 1]
+        if choice in options:
+            return choice
+        print("Opción inválida, elige una de la lista.")
+
+def get_public_params(session, base_url=BASE_URL, election=None):
+    params = session.get(f"{base_url}/public_params", params={'election': election}).json()
+    # H(m) debe ser el mismo que usa el servidor para verificar
+    helper.use_hash(params.get('hash', 'shake128'))
+    return int(params['n']), int(params['e'])
+
+def request_blind_signature(session, user, pwd, blinded_val, base_url=BASE_URL, election=None):
+    payload = {
+        'election': election,
+        'username': user,
+        'password': pwd,
+        'blinded_hash': str(blinded_val)
+    }
+    return session.post(f"{base_url}/sign_blinded", json=payload)
+
+def cast_vote(session, voto, nonce, signature, base_url=BASE_URL, election=None):
+    # Nota: Aquí NO enviamos el usuario, solo la elección, el voto, su número de serie y la firma
+    vote_payload = {
+        'election': election,
+        'vote': voto,
+        'nonce': nonce,
+        'signature': str(signature)
+    }
+    return session.post(f"{base_url}/vote", json=vote_payload)
+
+def verify_receipt(session, vote_id, voto, nonce, signature, base_url=BASE_URL):
+    """
+    Pide la prueba de inclusión y la verifica localmente. La hoja se calcula
+    aquí con nuestros datos; la raíz debe coincidir con la publicada en /merkle_root.
+    """
+    proof = session.get(f"{base_url}/proof/{vote_id}").json()
+    return verify_inclusion(ballot_leaf(voto, nonce, signature), proof['leaf_index'], proof['tree_size'],
+                            [bytes.fromhex(h) for h in proof['path']], bytes.fromhex(proof['root']))
+
 def main():
+    session = requests.Session()
     print("=== SISTEMA DE VOTACIÓN ELECTRÓNICA ===")
     print("1. Registrarse")
     print("2. Votar")
@@ -17,7 +85,7 @@ def main():
     if option == '1':
         user = input("Usuario: ")
         pwd = input("Password: ")
-        res = requests.post(f"{BASE_URL}/register", json={'username': user, 'password': pwd})
+        res = register(session, user, pwd)
         
         if res.status_code == 200:
             data = res.json()
@@ -31,25 +99,34 @@ def main():
     elif option == '2':
         user = input("Usuario para autenticar derecho a voto: ")
         pwd = input("Password: ")
-        voto = input("¿Por quién votas? (Candidato A / Candidato B): ")
 
-        # 1. Obtener parámetros públicos del servidor (n, e)
-        params = requests.get(f"{BASE_URL}/public_params").json()
-        n_serv = int(params['n'])
-        e_serv = int(params['e'])
+        # 0. Elegir elección y candidato de las listas del servidor, ANTES de cegar:
+        # el servidor gasta el derecho a voto al firmar, aunque luego el voto sea inválido
+        elections = get_elections(session)
+        if not elections:
+            print("No hay elecciones abiertas.")
+            return
+        election = elections[0]
+        if len(elections) > 1:
+            print("\nElecciones:")
+            labels = [f"{e['title']} ({e['slug']})" for e in elections]
+            election = elections[labels.index(choose_from("¿En qué elección votas? ", labels))]
+        print(f"\nCandidatos de '{election['title']}':")
+        voto = choose_from("¿Por quién votas? (número o nombre): ", election['candidates'])
+        slug = election['slug']
+
+        # 1. Obtener parámetros públicos del servidor (n, e) de esa elección
+        n_serv, e_serv = get_public_params(session, election=slug)
 
         # 2. CEGADO (Blinding) - Ocurre localmente
         # El servidor NUNCA ve el voto real, solo ve números aleatorios
-        blinded_val, r = helper.blind_message(voto, n_serv, e_serv)
+        # El número de serie hace única la firma de esta boleta
+        nonce = new_ballot_nonce()
+        blinded_val, r = helper.blind_message(ballot_message(voto, nonce), n_serv, e_serv)
         print(f"\n[CLIENTE] Voto cegado generado: {blinded_val.__str__()[:20]}...")
 
         # 3. Solicitar Firma al Servidor
-        payload = {
-            'username': user,
-            'password': pwd,
-            'blinded_hash': str(blinded_val)
-        }
-        res = requests.post(f"{BASE_URL}/sign_blinded", json=payload)
+        res = request_blind_signature(session, user, pwd, blinded_val, election=slug)
         
         if res.status_code != 200:
             print("Error obteniendo firma:", res.json())
@@ -63,13 +140,13 @@ def main():
         print(f"[CLIENTE] Firma descegada obtenida. Lista para votar.")
 
         # 5. Enviar voto a la urna (Anónimo)
-        # Nota: Aquí NO enviamos el usuario, solo el voto y la firma
-        vote_payload = {
-            'vote': voto,
-            'signature': str(real_signature)
-        }
-        res_vote = requests.post(f"{BASE_URL}/vote", json=vote_payload)
+        res_vote = cast_vote(session, voto, nonce, real_signature, election=slug)
         print("\nRespuesta de la urna:", res_vote.json())
 
+        # 6. Comprobar que la boleta quedó dentro del árbol de Merkle publicado
+        if res_vote.status_code == 200:
+            included = verify_receipt(session, res_vote.json()['vote_id'], voto, nonce, real_signature)
+            print("[CLIENTE] Prueba de inclusión:", "VÁLIDA" if included else "INVÁLIDA")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,29 +1,307 @@
 from Crypto.PublicKey import RSA
-from Crypto.Hash import SHAKE128
-from Crypto.Util.number import bytes_to_long, long_to_bytes, inverse
+from Crypto.Hash import SHA256
+from Crypto.Util.asn1 import DerSequence
+from Crypto.Util.number import long_to_bytes, inverse
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import hashlib
+import os
 import random
+import secrets
+import threading
+
+
+def load_or_create_admin_key(key_path, bits=2048):
+    """
+    Carga la llave del Admin desde un PEM en disco o la genera si no existe.
+    Todos los workers del servidor comparten así la misma llave.
+    """
+    if os.path.exists(key_path):
+        with open(key_path, 'rb') as f:
+            return RSA.import_key(f.read())
+
+    key = RSA.generate(bits)
+    tmp_path = f'{key_path}.{os.getpid()}.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key.export_key())
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        # os.link falla si otro worker ya publicó su llave: nos quedamos con esa
+        os.link(tmp_path, key_path)
+    except FileExistsError:
+        with open(key_path, 'rb') as f:
+            key = RSA.import_key(f.read())
+    finally:
+        os.remove(tmp_path)
+    return key
+
+
+def pubkey_fingerprint(key):
+    """
+    Huella de una llave RSA: SHA-256 del DER (PKCS#1) de su módulo y exponente.
+    Sirve igual para la llave privada o la pública (solo usa n y e).
+    """
+    der = DerSequence([key.n, key.e]).encode()
+    return SHA256.new(der).digest()
+
+
+def new_ballot_nonce():
+    """Número de serie aleatorio de una boleta (128 bits en hexadecimal)"""
+    return secrets.token_hex(16)
+
+
+def ballot_message(vote_content, nonce):
+    """
+    Mensaje que firma el Admin: el voto más el número de serie de la boleta.
+    Sin el número de serie, todos los votos por el mismo candidato tendrían la
+    misma firma (RSA es determinista) y una firma se podría reusar sin límite.
+    Los votos antiguos (nonce None) firmaban solo el voto.
+    """
+    if nonce is None:
+        return vote_content
+    return f'{vote_content}|{nonce}'
+
+
+def signature_digest(signature):
+    """
+    SHA-256 de una firma (entero) en bytes big-endian.
+    Es la llave del índice de firmas gastadas: cada firma entra una sola vez.
+    """
+    return SHA256.new(long_to_bytes(int(signature))).digest()
+
+
+# --- H(m): DEL MENSAJE A UN ENTERO ---
+
+class MessageHash:
+    """
+    Estrategia H(m) -> entero que se firma. Los resultados se memoizan en un
+    LRU acotado, con llave (mensaje, bits de salida): con pocos candidatos los
+    mensajes repetidos (votos sin número de serie, verificaciones repetidas)
+    no se vuelven a hashear.
+    """
+    name = None
+    description = None
+
+    def __init__(self, cache_size=1024):
+        self.cache_size = cache_size
+        if cache_size:
+            self._memo = functools.lru_cache(maxsize=cache_size)(self._hash)
+        else:
+            self._memo = self._hash
+
+    def __call__(self, message, n):
+        return self._memo(message, self.output_bits(n))
+
+    def _hash(self, message, bits):
+        return self.digest(message.encode('utf-8'), bits)
+
+    def output_bits(self, n):
+        raise NotImplementedError
+
+    def digest(self, data, bits):
+        raise NotImplementedError
+
+    def cache_info(self):
+        return self._memo.cache_info()._asdict() if self.cache_size else None
+
+
+class Shake128Hash(MessageHash):
+    """SHAKE128 con 64 bytes de salida (el esquema original del sistema)"""
+    name = 'shake128'
+    description = 'SHAKE128 (64 bytes, big-endian)'
+
+    def output_bits(self, n):
+        return 512
+
+    def digest(self, data, bits):
+        return int.from_bytes(hashlib.shake_128(data).digest(bits // 8), 'big')
+
+
+class FullDomainHash(MessageHash):
+    """
+    Full-domain hash: SHAKE256 extendido a |n| - 1 bits, así H(m) cubre todo
+    el rango de n (y no solo 512 de sus 2048 bits) sin pasarse de n.
+    """
+    name = 'fdh-shake256'
+    description = 'SHAKE256 truncado a |n|-1 bits (big-endian)'
+
+    def output_bits(self, n):
+        return n.bit_length() - 1
+
+    def digest(self, data, bits):
+        size = (bits + 7) // 8
+        return int.from_bytes(hashlib.shake_256(data).digest(size), 'big') >> (size * 8 - bits)
+
+
+HASH_SCHEMES = {cls.name: cls for cls in (Shake128Hash, FullDomainHash)}
+
+
+def make_message_hash(scheme='shake128', cache_size=1024):
+    try:
+        return HASH_SCHEMES[scheme](cache_size=cache_size)
+    except KeyError:
+        raise ValueError(f"Esquema de hash desconocido: {scheme}")
+
+
+class CrtSigner:
+    """
+    Firma RSA usando el Teorema Chino del Residuo (CRT).
+    Dos exponenciaciones de 1024 bits en vez de una de 2048 (~3-4x más rápido).
+    """
+    def __init__(self, key):
+        self.n, self.e, self.d = key.n, key.e, key.d
+        self.p, self.q = key.p, key.q
+        self.dP = self.d % (self.p - 1)
+        self.dQ = self.d % (self.q - 1)
+        self.qInv = inverse(self.q, self.p)
+
+    def sign(self, m):
+        s1 = pow(m, self.dP, self.p)
+        s2 = pow(m, self.dQ, self.q)
+        h = (self.qInv * (s1 - s2)) % self.p
+        s = s2 + h * self.q
+
+        # Chequeo de fallas (ataque de Bellcore): una firma CRT corrupta
+        # revela la factorización de n, así que nunca la devolvemos.
+        if pow(s, self.e, self.n) != m % self.n:
+            s = pow(m, self.d, self.n)
+        return s
+
+
+# --- FIRMA EN PARALELO (un proceso por núcleo) ---
+
+# Cada proceso worker importa la llave del Admin una sola vez
+_worker_signer = None
+
+
+def _init_signing_worker(key_pem):
+    global _worker_signer
+    _worker_signer = CrtSigner(RSA.import_key(key_pem))
+
+
+def _sign_chunk(values):
+    return [_worker_signer.sign(m) for m in values]
+
+
+class BlindingFactor(int):
+    """
+    Factor de cegado r que además recuerda su inverso r^-1 mod n,
+    para que descegar sea una sola multiplicación.
+    """
+    def __new__(cls, r, r_inv):
+        obj = super().__new__(cls, r)
+        obj.inverse = r_inv
+        return obj
+
+
+class BlindingPool:
+    """
+    Reserva de factores de cegado precalculados (r^e mod n, r^-1 mod n).
+    Un hilo en segundo plano rellena la reserva hasta 'high' y despierta
+    cuando baja de 'low', así el request solo toma valores ya listos.
+    """
+    def __init__(self, pub_n, pub_e, low=64, high=256):
+        if not 0 <= low < high:
+            raise ValueError("Se requiere 0 <= low < high.")
+        self.n, self.e = pub_n, pub_e
+        self.low, self.high = low, high
+        self.hits = 0
+        self.misses = 0
+        self._items = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._fill, name='blinding-pool', daemon=True)
+        self._thread.start()
+
+    def matches(self, pub_n, pub_e):
+        return self.n == pub_n and self.e == pub_e
+
+    def make_factor(self):
+        """Calcula (r, r^e mod n, r^-1 mod n) desde cero"""
+        r = random.randint(2, self.n - 1)
+        return r, pow(r, self.e, self.n), inverse(r, self.n)
+
+    def take(self):
+        """Devuelve un trío precalculado o None si la reserva está vacía"""
+        with self._cond:
+            if not self._items:
+                self.misses += 1
+                self._cond.notify()
+                return None
+            self.hits += 1
+            item = self._items.pop()
+            if len(self._items) < self.low:
+                self._cond.notify()
+            return item
+
+    def _fill(self):
+        while True:
+            with self._cond:
+                while not self._stopped and len(self._items) >= self.high:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                missing = min(self.high - len(self._items), 16)
+            # La exponenciación se hace fuera del candado, en tandas pequeñas
+            batch = [self.make_factor() for _ in range(missing)]
+            with self._cond:
+                self._items.extend(batch[:self.high - len(self._items)])
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            return {'depth': len(self._items), 'hits': self.hits, 'misses': self.misses,
+                    'low': self.low, 'high': self.high}
+
 
 class CryptoManager:
-    def __init__(self):
-        # Generamos la llave maestra de la "Autoridad Electoral" (Admin)
-        # En un sistema real, estas llaves se cargarían de un archivo seguro.
-        self.admin_key = RSA.generate(2048)
+    def __init__(self, key_path=None, hash_scheme='shake128', hash_cache_size=1024):
+        # Llave maestra de la "Autoridad Electoral" (Admin).
+        # Si se indica key_path se carga (o crea) desde disco; si no, es efímera.
+        self.key_path = key_path
+        if key_path:
+            self.admin_key = load_or_create_admin_key(key_path)
+        else:
+            self.admin_key = RSA.generate(2048)
         self.admin_pub = self.admin_key.publickey()
+        # RsaKey.n convierte su entero interno en cada acceso: lo guardamos una vez
+        self._admin_n, self._admin_e = self.admin_pub.n, self.admin_pub.e
+        self.signer = CrtSigner(self.admin_key)
+        self.hasher = make_message_hash(hash_scheme, hash_cache_size)
+        self.blinding_pool = None
+        self._signing_executor = None
+
+    def start_blinding_pool(self, low=64, high=256):
+        """Arranca la reserva de factores de cegado para (n, e) del Admin"""
+        if self.blinding_pool is None:
+            n, e = self.get_admin_pub_params()
+            self.blinding_pool = BlindingPool(n, e, low=low, high=high)
+        return self.blinding_pool
 
     def get_admin_pub_params(self):
         """Devuelve (n, e) para que el usuario pueda cegar el voto"""
-        return (self.admin_pub.n, self.admin_pub.e)
+        return (self._admin_n, self._admin_e)
 
     def generate_user_keys(self):
-        """Genera par de llaves para el usuario nuevo"""
+        """Genera par de llaves para el usuario nuevo, junto con su huella"""
         key = RSA.generate(2048)
-        return key.export_key(), key.publickey().export_key()
+        return key.export_key(), key.publickey().export_key(), pubkey_fingerprint(key)
+
+    def use_hash(self, scheme):
+        """Cambia la estrategia de H(m) (p. ej. para igualar la del servidor)"""
+        if scheme != self.hasher.name:
+            self.hasher = make_message_hash(scheme, self.hasher.cache_size)
 
-    def hash_msg(self, message):
-        """Uso de SHAKE128 para obtener un hash numérico"""
-        shake = SHAKE128.new(message.encode('utf-8'))
-        # Leemos 64 bytes para alta seguridad
-        return bytes_to_long(shake.read(64))
+    def hash_msg(self, message, pub_n=None):
+        """H(m) como entero según la estrategia configurada (memoizado)"""
+        return self.hasher(message, pub_n or self._admin_n)
 
     # --- PROTOCOLO DE FIRMA CIEGA ---
 
@@ -32,11 +310,19 @@ class CryptoManager:
         CLIENTE: Cega el mensaje.
         m' = (H(m) * r^e) mod n
         """
-        m = self.hash_msg(message)
-        r = random.randint(2, pub_n - 1) # Factor de cegado aleatorio
-        
-        # r^e mod n
-        blind_factor = pow(r, pub_e, pub_n)
+        m = self.hash_msg(message, pub_n)
+
+        pool = self.blinding_pool
+        item = pool.take() if pool and pool.matches(pub_n, pub_e) else None
+        if item is not None:
+            # Reserva precalculada: r^e y r^-1 ya vienen listos
+            r, blind_factor, r_inv = item
+            r = BlindingFactor(r, r_inv)
+        else:
+            r = random.randint(2, pub_n - 1) # Factor de cegado aleatorio
+            # r^e mod n
+            blind_factor = pow(r, pub_e, pub_n)
+
         # m * r^e mod n
         m_blinded = (m * blind_factor) % pub_n
         
@@ -47,16 +333,48 @@ class CryptoManager:
         SERVIDOR: Firma el mensaje cegado sin verlo.
         s' = (m')^d mod n
         """
-        # Usamos la llave privada del admin (d)
-        s_blinded = pow(m_blinded, self.admin_key.d, self.admin_key.n)
+        # Usamos la llave privada del admin (d) vía CRT
+        s_blinded = self.signer.sign(m_blinded)
         return s_blinded
 
+    def sign_blinded_many(self, blinded_values, workers=None, chunk_size=32):
+        """
+        SERVIDOR: Firma una lista de mensajes cegados repartiéndolos entre
+        varios procesos (pow retiene el GIL, así que los hilos no escalan).
+        Devuelve las firmas en el mismo orden.
+        """
+        values = list(blinded_values)
+        if len(values) <= chunk_size:
+            # Lotes chicos: el costo de IPC no compensa
+            return [self.signer.sign(m) for m in values]
+
+        if self._signing_executor is None:
+            self._signing_executor = ProcessPoolExecutor(
+                max_workers=workers or os.cpu_count(),
+                initializer=_init_signing_worker,
+                initargs=(self.admin_key.export_key(),),
+            )
+        chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+        signed = self._signing_executor.map(_sign_chunk, chunks)
+        return [s for chunk in signed for s in chunk]
+
+    def shutdown(self):
+        """Detiene los procesos de firma y la reserva de cegado"""
+        if self._signing_executor is not None:
+            self._signing_executor.shutdown()
+            self._signing_executor = None
+        if self.blinding_pool is not None:
+            self.blinding_pool.stop()
+            self.blinding_pool = None
+
     def unblind_signature(self, s_blinded, r, pub_n):
         """
         CLIENTE: Quita el factor de cegado para obtener la firma válida.
         s = s' * r^(-1) mod n
         """
-        r_inv = inverse(r, pub_n)
+        r_inv = getattr(r, 'inverse', None)
+        if r_inv is None:
+            r_inv = inverse(r, pub_n)
         s = (s_blinded * r_inv) % pub_n
         return s
 
@@ -64,7 +382,7 @@ class CryptoManager:
         """
         URNA: Verifica s^e mod n == H(m)
         """
-        m_hash = self.hash_msg(message)
+        m_hash = self.hash_msg(message, pub_n)
         # Verificación matemática RSA pura
         hash_from_sig = pow(int(signature), pub_e, pub_n)
         return hash_from_sig == m_hash
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Elecciones simultáneas (p. ej. un consejo y un referéndum).
+
+Cada elección firma con su propia llave del Admin, guardada en
+instance/election_keys/<id>.pem; la elección general conserva
+instance/admin_key.pem, con la que se firmaron los votos anteriores.
+ElectionKeys carga el CryptoManager de cada elección una sola vez por proceso.
+"""
+import json
+import os
+import threading
+
+from crypto_utils import CryptoManager
+from models import db, Election, DEFAULT_ELECTION_ID
+
+DEFAULT_CANDIDATES = ['Partido Python', 'Alianza Java', 'Frente C++']
+
+
+class ElectionKeys:
+    def __init__(self, key_dir, default_key_path, blinding_pool=None, **crypto_options):
+        self.key_dir = key_dir
+        self.default_key_path = default_key_path
+        self.blinding_pool = blinding_pool  # (low, high) o None
+        self.crypto_options = crypto_options
+        self._managers = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def key_path(self, election_id):
+        if election_id == DEFAULT_ELECTION_ID:
+            return self.default_key_path
+        return os.path.join(self.key_dir, f'{election_id}.pem')
+
+    def get(self, election_id):
+        """CryptoManager de la elección (carga o crea su llave la primera vez)"""
+        crypto = self._managers.get(election_id)
+        if crypto is not None:
+            return crypto
+        with self._lock:
+            crypto = self._managers.get(election_id)
+            if crypto is None:
+                os.makedirs(self.key_dir, exist_ok=True)
+                crypto = CryptoManager(self.key_path(election_id), **self.crypto_options)
+                if self.blinding_pool:
+                    crypto.start_blinding_pool(*self.blinding_pool)
+                for hook in self._hooks:
+                    hook(crypto)
+                self._managers[election_id] = crypto
+        return crypto
+
+    def on_load(self, hook):
+        """Aplica 'hook' a los CryptoManager ya cargados y a los que se carguen después"""
+        with self._lock:
+            self._hooks.append(hook)
+            for crypto in self._managers.values():
+                hook(crypto)
+
+    def loaded(self):
+        return dict(self._managers)
+
+    def shutdown(self):
+        with self._lock:
+            for crypto in self._managers.values():
+                crypto.shutdown()
+            self._managers.clear()
+
+
+class ElectionNotFound(LookupError):
+    """La elección indicada no existe."""
+
+
+def find_election(ref=None):
+    """Busca una elección por id o por slug; sin referencia, la general"""
+    if ref is None or ref == '':
+        return db.session.get(Election, DEFAULT_ELECTION_ID)
+    if isinstance(ref, int) or str(ref).isdigit():
+        return db.session.get(Election, int(ref))
+    return Election.query.filter_by(slug=str(ref)).first()
+
+
+def require_election(ref=None):
+    election = find_election(ref)
+    if election is None:
+        raise ElectionNotFound(f'No existe la elección {ref!r}.')
+    return election
+
+
+def create_election(slug, title, candidates):
+    election = Election(slug=slug, title=title, candidates=json.dumps(list(candidates)))
+    db.session.add(election)
+    db.session.commit()
+    return election
@@ -0,0 +1,208 @@
+"""
+Reserva de pares de llaves RSA pre-generados para /register.
+
+Generar una llave de 2048 bits tarda desde decenas de milisegundos hasta
+segundos (búsqueda de primos). Un proceso aparte las genera en segundo plano
+y un hilo las guarda en la tabla PooledKey, con la llave privada cifrada con
+AES-GCM. /register solo toma una ya lista; si la reserva está vacía se
+genera en línea como antes.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+import threading
+import time
+
+from Crypto.Cipher import AES
+from Crypto.PublicKey import RSA
+from Crypto.Random import get_random_bytes
+from sqlalchemy import func
+
+from crypto_utils import pubkey_fingerprint
+from models import db, PooledKey
+
+
+def load_or_create_secret(path, size=32):
+    """Lee una llave simétrica de disco o la crea (compartida entre workers)"""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    secret = get_random_bytes(size)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secret)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        with open(path, 'rb') as f:
+            secret = f.read()
+    finally:
+        os.remove(tmp_path)
+    return secret
+
+
+def _generate_key_pair(bits=2048):
+    """Corre en el proceso generador: devuelve (priv_pem, pub_pem, huella)"""
+    key = RSA.generate(bits)
+    return key.export_key(), key.publickey().export_key(), pubkey_fingerprint(key)
+
+
+class KeyPool:
+    # Espera antes de reintentar tras un error, duplicándose hasta el máximo
+    RETRY_INITIAL = 1.0
+    RETRY_MAX = 60.0
+
+    def __init__(self, app, secret_path, low=16, high=64, workers=1):
+        if not 0 <= low < high:
+            raise ValueError("Se requiere 0 <= low < high.")
+        self.app = app
+        self.low, self.high = low, high
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.generation_seconds = 0.0
+        self._secret = load_or_create_secret(secret_path)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._stop_event = threading.Event()
+        self._workers = workers
+        # La búsqueda de primos va en otro proceso para no competir por el GIL
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._thread = threading.Thread(target=self._fill, name='key-pool', daemon=True)
+        self._thread.start()
+
+    # --- Cifrado en reposo de la llave privada ---
+
+    def _seal(self, priv_pem):
+        cipher = AES.new(self._secret, AES.MODE_GCM)
+        ciphertext, tag = cipher.encrypt_and_digest(priv_pem)
+        return cipher.nonce + tag + ciphertext
+
+    def _open(self, blob):
+        nonce, tag, ciphertext = blob[:16], blob[16:32], blob[32:]
+        cipher = AES.new(self._secret, AES.MODE_GCM, nonce=nonce)
+        return cipher.decrypt_and_verify(ciphertext, tag)
+
+    # --- Consumo ---
+
+    def depth(self):
+        return db.session.query(func.count(PooledKey.id)).scalar()
+
+    def take(self):
+        """
+        Saca un par (priv_pem, pub_pem, huella) de la reserva o devuelve
+        None si está vacía. Cada fila la consume un solo request.
+        El DELETE queda en la transacción del llamador (sin commit): se confirma
+        junto con el usuario nuevo, y si el registro falla el rollback devuelve
+        la llave a la reserva. Abre la transacción de escritura: el llamador
+        debe hacer el trabajo lento antes y el commit enseguida.
+        """
+        while True:
+            entry = PooledKey.query.order_by(PooledKey.id).first()
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                self._wakeup.set()
+                return None
+
+            blob, pub_pem, fingerprint = entry.private_blob, entry.public_key_pem, entry.pubkey_fingerprint
+            claimed = PooledKey.query.filter_by(id=entry.id).delete(synchronize_session=False)
+            if claimed:
+                break
+            # Otro worker la tomó primero: intentamos con la siguiente
+
+        with self._lock:
+            self.hits += 1
+        self._wakeup.set()
+        return self._open(blob), pub_pem.encode(), fingerprint
+
+    # --- Generación en segundo plano ---
+
+    def _generate(self):
+        """
+        Genera un par en el proceso generador. Devuelve None si el executor ya
+        se cerró (p. ej. el intérprete está terminando).
+        """
+        try:
+            future = self._executor.submit(_generate_key_pair)
+        except BrokenProcessPool:
+            raise
+        except RuntimeError:
+            # 'cannot schedule new futures after shutdown'
+            return None
+        return future.result()
+
+    def _restart_executor(self):
+        """El proceso generador murió: se reemplaza el executor completo"""
+        broken = self._executor
+        self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        broken.shutdown(wait=False)
+
+    def _fill(self):
+        filling = True
+        retry = self.RETRY_INITIAL
+        with self.app.app_context():
+            while not self._stopped:
+                try:
+                    depth = self.depth()
+                    db.session.remove()
+                    # Histéresis: se llena hasta 'high' y se reanuda al bajar de 'low'
+                    if depth >= self.high:
+                        filling = False
+                    elif depth < self.low:
+                        filling = True
+                    if not filling:
+                        # Revisamos cuando alguien consume (o cada tanto, por otros workers)
+                        self._wakeup.wait(timeout=5)
+                        self._wakeup.clear()
+                        continue
+
+                    start = time.perf_counter()
+                    generated = self._generate()
+                    if generated is None:
+                        return
+                    priv_pem, pub_pem, fingerprint = generated
+                    elapsed = time.perf_counter() - start
+
+                    db.session.add(PooledKey(private_blob=self._seal(priv_pem),
+                                             public_key_pem=pub_pem.decode(),
+                                             pubkey_fingerprint=fingerprint))
+                    db.session.commit()
+                    db.session.remove()
+                except Exception as exc:
+                    if self._stopped:
+                        return
+                    # Mientras tanto /register genera en línea; se reintenta con espera creciente
+                    self.app.logger.exception('Error al llenar la reserva de llaves; reintento en %.0f s', retry)
+                    db.session.rollback()
+                    db.session.remove()
+                    if isinstance(exc, BrokenProcessPool):
+                        self._restart_executor()
+                    self._stop_event.wait(timeout=retry)
+                    retry = min(retry * 2, self.RETRY_MAX)
+                    continue
+
+                retry = self.RETRY_INITIAL
+                with self._lock:
+                    self.generated += 1
+                    self.generation_seconds += elapsed
+
+    def stop(self):
+        self._stopped = True
+        self._stop_event.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._executor.shutdown()
+
+    def stats(self):
+        depth = self.depth()
+        with self._lock:
+            rate = self.generated / self.generation_seconds if self.generation_seconds else 0.0
+            return {'depth': depth, 'low': self.low, 'high': self.high,
+                    'hits': self.hits, 'misses': self.misses,
+                    'generated': self.generated, 'keys_per_second': rate}
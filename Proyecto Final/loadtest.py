@@ -0,0 +1,164 @@
+"""
+Generador de carga para medir la capacidad del servidor antes de una elección.
+
+Lanza N votantes virtuales concurrentes que recorren el flujo completo de
+client.py (registro -> parámetros públicos -> firma ciega -> voto) y reporta
+latencias p50/p95/p99 y rendimiento por endpoint.
+
+Uso:
+    python loadtest.py --voters 200 --concurrency 16 --url http://127.0.0.1:5000
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import random
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from client import helper, register, get_elections, find_election, get_public_params, request_blind_signature, cast_vote
+from crypto_utils import ballot_message, new_ballot_nonce
+
+ENDPOINTS = ['register', 'public_params', 'sign_blinded', 'vote']
+
+
+class LatencyHistogram:
+    """Latencias (en segundos) de un endpoint, con percentiles y buckets log2 en ms"""
+
+    def __init__(self):
+        self.samples = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.samples.append(seconds)
+            if not ok:
+                self.errors += 1
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        # Método del rango más cercano
+        rank = max(1, int(round(p / 100.0 * len(ordered))))
+        return ordered[rank - 1]
+
+    def buckets(self):
+        """{límite_superior_ms: cantidad} con límites 1, 2, 4, 8... ms"""
+        counts = {}
+        for seconds in self.samples:
+            bound = 1
+            while bound < seconds * 1000:
+                bound *= 2
+            counts[bound] = counts.get(bound, 0) + 1
+        return dict(sorted(counts.items()))
+
+
+_local = threading.local()
+
+
+def _session(pool_size):
+    """Una Session por hilo, con su pool de conexiones keep-alive"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
+
+
+def _timed(histogram, call, *args):
+    start = time.perf_counter()
+    try:
+        response = call(*args)
+    except requests.RequestException:
+        histogram.record(time.perf_counter() - start, ok=False)
+        return None
+    histogram.record(time.perf_counter() - start, ok=response.status_code < 400)
+    return response
+
+
+def run_voter(base_url, histograms, run_id, index, pool_size, election):
+    """Un votante virtual: devuelve True si su voto llegó a la urna"""
+    session = _session(pool_size)
+    user = f'load-{run_id}-{index}'
+    pwd = uuid.uuid4().hex
+    voto = random.choice(election['candidates'])
+    slug = election['slug']
+
+    res = _timed(histograms['register'], register, session, user, pwd, base_url)
+    if res is None or res.status_code != 200:
+        return False
+
+    start = time.perf_counter()
+    try:
+        n, e = get_public_params(session, base_url, election=slug)
+    except (requests.RequestException, ValueError, KeyError):
+        histograms['public_params'].record(time.perf_counter() - start, ok=False)
+        return False
+    histograms['public_params'].record(time.perf_counter() - start)
+
+    # Cegado y descegado del lado del cliente, igual que client.py
+    nonce = new_ballot_nonce()
+    blinded_val, r = helper.blind_message(ballot_message(voto, nonce), n, e)
+    res = _timed(histograms['sign_blinded'], request_blind_signature, session, user, pwd, blinded_val,
+                 base_url, slug)
+    if res is None or res.status_code != 200:
+        return False
+    signature = helper.unblind_signature(int(res.json()['blind_signature']), r, n)
+
+    res = _timed(histograms['vote'], cast_vote, session, voto, nonce, signature, base_url, slug)
+    return res is not None and res.status_code == 200
+
+
+def run_load(base_url, voters, concurrency, election_ref=None):
+    # Los candidatos salen del servidor, igual que en client.py
+    election = find_election(get_elections(requests.Session(), base_url), election_ref)
+    if election is None:
+        raise SystemExit(f"No existe la elección {election_ref!r}.")
+    histograms = {name: LatencyHistogram() for name in ENDPOINTS}
+    run_id = uuid.uuid4().hex[:8]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda i: run_voter(base_url, histograms, run_id, i, concurrency, election),
+            range(voters)))
+    elapsed = time.perf_counter() - start
+    return histograms, sum(results), elapsed
+
+
+def print_report(histograms, completed, voters, elapsed):
+    print(f"\nVotantes: {voters}  Votos completos: {completed}  Tiempo total: {elapsed:.2f} s")
+    print(f"Rendimiento de punta a punta: {completed / elapsed:.2f} votos/s\n")
+    print(f"{'endpoint':<15}{'n':>7}{'errores':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name in ENDPOINTS:
+        h = histograms[name]
+        count = len(h.samples)
+        print(f"{name:<15}{count:>7}{h.errors:>9}{count / elapsed:>10.1f}"
+              f"{h.percentile(50) * 1000:>10.1f}{h.percentile(95) * 1000:>10.1f}{h.percentile(99) * 1000:>10.1f}")
+
+    print("\nHistogramas (ms <= límite: cantidad)")
+    for name in ENDPOINTS:
+        buckets = '  '.join(f'{bound}:{count}' for bound, count in histograms[name].buckets().items())
+        print(f"{name:<15}{buckets}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del sistema de votación.')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='URL base del servidor Flask.')
+    parser.add_argument('--voters', type=int, default=100, help='Cantidad de votantes virtuales.')
+    parser.add_argument('--concurrency', type=int, default=10, help='Votantes simultáneos.')
+    parser.add_argument('--election', default=None, help='Id o slug de la elección (por defecto, la general).')
+    args = parser.parse_args()
+
+    histograms, completed, elapsed = run_load(args.url.rstrip('/'), args.voters, args.concurrency, args.election)
+    print_report(histograms, completed, args.voters, elapsed)
+
+
+if __name__ == "__main__":
+    main()
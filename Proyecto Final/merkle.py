@@ -0,0 +1,176 @@
+"""
+Árbol de Merkle de solo-agregar sobre la urna (mismo esquema que RFC 6962).
+
+Cada voto es una hoja: H(0x00 || firma (256 bytes) || "voto|nonce") y cada
+nodo interno es H(0x01 || izquierdo || derecho), con SHA-256.
+
+La "frontera" son las raíces de los subárboles perfectos que forman el árbol
+(una por cada bit encendido del número de hojas). Agregar una hoja solo
+combina la frontera como un contador binario, O(log n), y la raíz publicada
+se obtiene doblando la frontera de derecha a izquierda. Frontera y raíz viven
+en MerkleState; cada nodo completo se guarda en MerkleNode para poder armar
+pruebas de inclusión de O(log n) hashes sin recorrer la urna. Cada elección
+tiene su propio árbol.
+"""
+import hashlib
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+
+from crypto_utils import ballot_message
+from models import db, MerkleNode, MerkleState, SIGNATURE_BYTES
+
+DIGEST_SIZE = 32
+EMPTY_ROOT = hashlib.sha256(b'').digest()
+
+
+def leaf_hash(data):
+    return hashlib.sha256(b'\x00' + data).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def ballot_leaf(vote_content, nonce, signature):
+    """Hoja de un voto; 'signature' es el entero de la firma o sus 256 bytes"""
+    if isinstance(signature, int):
+        signature = signature.to_bytes(SIGNATURE_BYTES, 'big')
+    return leaf_hash(signature + ballot_message(vote_content, nonce).encode('utf-8'))
+
+
+def root_from_frontier(frontier):
+    """Raíz del árbol a partir de su frontera (subárbol más grande primero)"""
+    if not frontier:
+        return EMPTY_ROOT
+    root = frontier[-1]
+    for node in reversed(frontier[:-1]):
+        root = node_hash(node, root)
+    return root
+
+
+def verify_inclusion(leaf, index, size, path, root):
+    """
+    Verifica una prueba de inclusión (RFC 9162, 2.1.3.2). Solo usa hashes,
+    así que cualquier observador puede correrla sin acceso a la base.
+    """
+    if not 0 <= index < size:
+        return False
+    fn, sn, r = index, size - 1, leaf
+    for p in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            r = node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r == root
+
+
+# --- Estado persistido ---
+
+def _split(blob):
+    return [blob[i:i + DIGEST_SIZE] for i in range(0, len(blob or b''), DIGEST_SIZE)]
+
+
+def current_state(election_id, conn=None):
+    """(tamaño, raíz) del árbol publicado de la elección"""
+    conn = conn or db.session
+    row = conn.execute(select(MerkleState.size, MerkleState.root)
+                       .where(MerkleState.election_id == election_id)).first()
+    return (row.size, row.root) if row else (0, EMPTY_ROOT)
+
+
+def append_leaves(election_id, leaves, conn=None):
+    """
+    Agrega hojas al árbol de la elección y devuelve el índice de la primera.
+    No hace commit: debe correr en la misma transacción que inserta los votos.
+    """
+    conn = conn or db.session
+    row = conn.execute(select(MerkleState.size, MerkleState.frontier)
+                       .where(MerkleState.election_id == election_id)).first()
+    size, frontier = (row.size, _split(row.frontier)) if row else (0, [])
+    first = size
+
+    nodes = []
+    for leaf in leaves:
+        index, level, node = size, 0, leaf
+        nodes.append({'election_id': election_id, 'level': 0, 'position': index, 'digest': node})
+        # Cada bit encendido del índice es un subárbol que se cierra (acarreo)
+        while index & 1:
+            node = node_hash(frontier.pop(), node)
+            index >>= 1
+            level += 1
+            nodes.append({'election_id': election_id, 'level': level, 'position': index, 'digest': node})
+        frontier.append(node)
+        size += 1
+
+    if not nodes:
+        return first
+    conn.execute(insert(MerkleNode), nodes)
+    values = {'size': size, 'frontier': b''.join(frontier), 'root': root_from_frontier(frontier)}
+    conn.execute(insert(MerkleState).values(election_id=election_id, **values)
+                 .on_conflict_do_update(index_elements=[MerkleState.election_id], set_=values))
+    return first
+
+
+def append_leaf(election_id, leaf, conn=None):
+    return append_leaves(election_id, [leaf], conn)
+
+
+# --- Pruebas de inclusión ---
+
+def _perfect_subtrees(start, end):
+    """(nivel, posición) de los subárboles perfectos que cubren [start, end)"""
+    spans = []
+    while start < end:
+        level = 0
+        while start % (2 << level) == 0 and start + (2 << level) <= end:
+            level += 1
+        spans.append((level, start >> level))
+        start += 1 << level
+    return spans
+
+
+def _path_spans(index, start, end):
+    """
+    Camino de auditoría de RFC 6962 (de la hoja a la raíz) como listas de
+    subárboles perfectos; cada lista se dobla en un solo hash del camino.
+    """
+    spans = []
+    while end - start > 1:
+        k = 1 << ((end - start - 1).bit_length() - 1)  # mayor potencia de 2 < n
+        if index < start + k:
+            spans.append(_perfect_subtrees(start + k, end))
+            end = start + k
+        else:
+            spans.append(_perfect_subtrees(start, start + k))
+            start += k
+    return spans[::-1]
+
+
+def inclusion_proof(election_id, index, conn=None):
+    """
+    Prueba de que la hoja 'index' está en el árbol actual de la elección.
+    Devuelve (hoja, camino, tamaño, raíz); lee O(log n) nodos por llave primaria.
+    """
+    conn = conn or db.session
+    size, root = current_state(election_id, conn)
+    if not 0 <= index < size:
+        raise ValueError('La hoja no está en el árbol.')
+
+    spans = _path_spans(index, 0, size)
+    wanted = {(0, index)} | {span for group in spans for span in group}
+    found = {(level, position): digest for level, position, digest in conn.execute(
+        select(MerkleNode.level, MerkleNode.position, MerkleNode.digest)
+        .where(MerkleNode.election_id == election_id,
+               tuple_(MerkleNode.level, MerkleNode.position).in_(list(wanted)))
+    )}
+
+    path = [root_from_frontier([found[span] for span in group]) for group in spans]
+    return found[(0, index)], path, size, root
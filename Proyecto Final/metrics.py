@@ -0,0 +1,265 @@
+"""
+Métricas del servidor en formato de texto de Prometheus (/metrics).
+
+- Tiempo de cada request por ruta, método y código de respuesta.
+- Tiempo de cada operación criptográfica (cegado, firma, verificación,
+  importación de llaves, hash de contraseñas...) y de los commits y consultas
+  a la base. Cada histograma trae además _count, que sirve de contador.
+- Perfilador por muestreo opcional: mientras corre un request se toma su
+  pila cada pocos milisegundos y se guardan las de los requests más lentos
+  en formato "folded" (una línea "f1;f2;f3 N" por pila), el que leen
+  flamegraph.pl y speedscope.
+"""
+from bisect import bisect_left
+from collections import Counter
+import functools
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+
+# Segundos; desde 10 us (hash de un mensaje) hasta 10 s (generar llaves RSA)
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help = name, help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # valores de etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *labelvalues):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def time(self, *labelvalues):
+        """Decorador que mide cada llamada de la función"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *labelvalues)
+            return wrapper
+        return decorator
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, list(counts), total_sum, count)
+                            for key, (counts, total_sum, count) in self._series.items())
+        for key, counts, total_sum, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", repr(bound))])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {total_sum!r}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class Gauge:
+    """Valor que se lee al momento de exportar (profundidad de las reservas, cola...)"""
+
+    def __init__(self, name, help_text, read):
+        self.name, self.help = name, help_text
+        self.read = read
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge', f'{self.name} {value}']
+
+
+def _fold(frame):
+    """Pila de un hilo como 'raíz;...;hoja' (formato folded de flamegraph.pl)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+                     .replace(';', ':'))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Toma la pila de cada hilo que atiende un request cada 'interval' segundos
+    y conserva las muestras de los 'keep' requests más lentos.
+    """
+    def __init__(self, interval=0.005, keep=20):
+        self.interval = interval
+        self.keep = keep
+        self._active = {}   # id del hilo -> Counter de pilas
+        self._slowest = []  # heap (segundos, secuencia, etiqueta, pilas)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def begin(self):
+        self._active[threading.get_ident()] = Counter()
+
+    def end(self, label, seconds):
+        stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks:
+            return
+        item = (seconds, next(self._seq), label, stacks)
+        with self._lock:
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, item)
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def _run(self):
+        while not self._stopped:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, stacks in list(self._active.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    stacks[_fold(frame)] += 1
+
+    def folded(self):
+        """
+        Pilas de los requests más lentos, el más lento primero. Cada pila
+        empieza con el request ('POST /vote 412ms') para agruparlas en la gráfica.
+        """
+        with self._lock:
+            slowest = sorted(self._slowest, reverse=True)
+        lines = []
+        for seconds, _, label, stacks in slowest:
+            root = f'{label} {seconds * 1000:.0f}ms'.replace(';', ':')
+            lines.extend(f'{root};{stack} {count}' for stack, count in stacks.items())
+        return '\n'.join(lines) + '\n'
+
+    def stop(self):
+        self._stopped = True
+        self._thread.join()
+
+
+class Metrics:
+    """
+    Instrumenta la app: tiempo por request (hooks de Flask), commits y
+    consultas (eventos de SQLAlchemy) y las funciones que se le indiquen.
+    """
+    def __init__(self, app, db, profiler=False, profiler_interval=0.005, profiler_keep=20):
+        self.requests = Histogram('http_request_duration_seconds',
+                                  'Tiempo de respuesta por ruta.', ('method', 'route', 'status'))
+        self.operations = Histogram('crypto_operation_seconds',
+                                    'Tiempo de cada operación criptográfica.', ('op',))
+        self.commits = Histogram('db_commit_seconds', 'Tiempo de flush + commit de cada transacción.')
+        self.queries = Histogram('db_query_seconds', 'Tiempo de cada sentencia SQL.')
+        self.gauges = []
+        self.profiler = SamplingProfiler(profiler_interval, profiler_keep) if profiler else None
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_execute)
+        event.listen(db.session, 'before_commit', self._before_commit)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    # --- Instrumentación de funciones ---
+
+    def timed(self, op):
+        """Decorador: agrega la función a crypto_operation_seconds{op=...}"""
+        return self.operations.time(op)
+
+    def instrument(self, obj, method_names, prefix=''):
+        """Envuelve métodos de una instancia (p. ej. CryptoManager) con su temporizador"""
+        for name in method_names:
+            setattr(obj, name, self.timed(prefix + name)(getattr(obj, name)))
+
+    def gauge(self, name, help_text, read):
+        self.gauges.append(Gauge(name, help_text, read))
+
+    # --- Requests ---
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        if self.profiler:
+            self.profiler.begin()
+
+    def _observe_request(self, status):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        self.requests.observe(elapsed, request.method, route, status)
+        if self.profiler:
+            self.profiler.end(f'{request.method} {route}', elapsed)
+
+    def _after_request(self, response):
+        self._observe_request(response.status_code)
+        return response
+
+    def _teardown_request(self, exc):
+        # Solo llega con metrics_start si after_request no corrió (excepción)
+        self._observe_request(500)
+
+    # --- Base de datos ---
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_start'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('metrics_start', None)
+        if start is not None:
+            self.queries.observe(time.perf_counter() - start)
+
+    def _before_commit(self, session):
+        session.info['metrics_commit_start'] = time.perf_counter()
+
+    def _after_commit(self, session):
+        start = session.info.pop('metrics_commit_start', None)
+        if start is not None:
+            self.commits.observe(time.perf_counter() - start)
+
+    def _after_rollback(self, session):
+        session.info.pop('metrics_commit_start', None)
+
+    # --- Exportación ---
+
+    def render(self):
+        lines = []
+        for metric in (self.requests, self.operations, self.commits, self.queries, *self.gauges):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
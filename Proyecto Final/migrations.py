@@ -0,0 +1,218 @@
+"""
+Migraciones de esquema para bases ya existentes (instance/voting_system.db).
+
+db.create_all() crea tablas nuevas pero no toca las que ya existen, así que
+los cambios a tablas viejas van aquí. La versión aplicada se guarda en
+PRAGMA user_version; cada migración corre una sola vez y en orden.
+
+Uso: flask --app app migrate  (también se aplican al arrancar app.py)
+"""
+import json
+
+from sqlalchemy import bindparam, inspect, text
+from Crypto.PublicKey import RSA
+from werkzeug.security import generate_password_hash
+
+from crypto_utils import pubkey_fingerprint
+from elections import DEFAULT_CANDIDATES
+from merkle import append_leaves, ballot_leaf
+from passwords import DEFAULT_COST
+from models import (db, User, Vote, Election, Tally, TallyVersion, MerkleNode, MerkleState,
+                    SIGNATURE_BYTES, DEFAULT_ELECTION_ID)
+
+
+def _create_index(conn, column):
+    """Crea (si falta) el índice que el modelo declara sobre 'column'"""
+    for index in column.table.indexes:
+        if list(index.columns) == [column]:
+            index.create(conn, checkfirst=True)
+
+
+def _create_indexes(conn):
+    """Índices de Vote.vote_content y User.has_voted"""
+    _create_index(conn, Vote.__table__.c.vote_content)
+    _create_index(conn, User.__table__.c.has_voted)
+
+
+def _create_named_index(conn, table, name):
+    """Crea (si falta) un índice de varias columnas declarado en __table_args__"""
+    for index in table.indexes:
+        if index.name == name:
+            index.create(conn, checkfirst=True)
+
+
+def _columns(conn, table):
+    return {c['name'] for c in inspect(conn).get_columns(table.name)}
+
+
+def _add_column(conn, table, column):
+    """ALTER TABLE ... ADD COLUMN si la columna todavía no existe"""
+    if column.name not in _columns(conn, table):
+        col_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+
+
+def _add_pubkey_fingerprint(conn, batch_size=500):
+    """Agrega User.pubkey_fingerprint y la calcula para los usuarios existentes"""
+    _add_column(conn, User.__table__, User.__table__.c.pubkey_fingerprint)
+    _create_index(conn, User.__table__.c.pubkey_fingerprint)
+
+    users = User.__table__
+    while True:
+        rows = conn.execute(
+            users.select().with_only_columns(users.c.id, users.c.public_key_pem)
+            .where(users.c.pubkey_fingerprint.is_(None))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        for user_id, pem in rows:
+            fingerprint = pubkey_fingerprint(RSA.import_key(pem))
+            conn.execute(users.update().where(users.c.id == user_id)
+                         .values(pubkey_fingerprint=fingerprint))
+
+
+def _add_ballot_serials(conn):
+    """
+    Agrega Vote.nonce y Vote.signature_hash (índice único de firmas gastadas).
+    Los votos antiguos quedan con ambos en NULL: firmaban solo el nombre del
+    candidato, así que sus firmas se repiten legítimamente entre votantes.
+    """
+    _add_column(conn, Vote.__table__, Vote.__table__.c.nonce)
+    _add_column(conn, Vote.__table__, Vote.__table__.c.signature_hash)
+    _create_index(conn, Vote.__table__.c.signature_hash)
+
+
+def _binary_signatures(conn, batch_size=1000):
+    """
+    Vote.signature pasa de texto decimal (~617 caracteres) a 256 bytes
+    big-endian. SQLite guarda el BLOB tal cual aunque la columna antigua se
+    declaró VARCHAR; el espacio liberado se recupera con VACUUM.
+    """
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, signature FROM vote WHERE typeof(signature) = 'text' LIMIT :n"
+        ), {'n': batch_size}).all()
+        if not rows:
+            return
+        conn.execute(
+            text('UPDATE vote SET signature = :signature WHERE id = :id'),
+            [{'id': vote_id, 'signature': int(signature).to_bytes(SIGNATURE_BYTES, 'big')}
+             for vote_id, signature in rows],
+        )
+
+
+def _merkle_accumulator(conn, batch_size=1000):
+    """
+    Agrega Vote.merkle_index y mete al árbol de Merkle los votos que ya
+    estaban en la urna, en orden de id.
+    """
+    _add_column(conn, Vote.__table__, Vote.__table__.c.merkle_index)
+    _create_index(conn, Vote.__table__.c.merkle_index)
+
+    votes = Vote.__table__
+    while True:
+        rows = conn.execute(
+            votes.select().with_only_columns(votes.c.id, votes.c.vote_content, votes.c.nonce, votes.c.signature)
+            .where(votes.c.merkle_index.is_(None))
+            .order_by(votes.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        first = append_leaves(DEFAULT_ELECTION_ID, [ballot_leaf(content, nonce, signature)
+                                                    for _, content, nonce, signature in rows], conn)
+        conn.execute(
+            votes.update().where(votes.c.id == bindparam('vote_id')).values(merkle_index=bindparam('leaf')),
+            [{'vote_id': row.id, 'leaf': first + i} for i, row in enumerate(rows)],
+        )
+
+
+def _multiple_elections(conn):
+    """
+    Varias elecciones: los votos existentes pasan a la elección general, el
+    voto único pasa de User.has_voted a ElectionVoter y Tally, TallyVersion y
+    el árbol de Merkle quedan particionados por elección.
+    """
+    conn.execute(Election.__table__.insert().prefix_with('OR IGNORE').values(
+        id=DEFAULT_ELECTION_ID, slug='general', title='Elección general',
+        candidates=json.dumps(DEFAULT_CANDIDATES)))
+    conn.execute(text(
+        'INSERT OR IGNORE INTO election_voter (election_id, user_id) '
+        'SELECT :election, id FROM user WHERE has_voted'
+    ), {'election': DEFAULT_ELECTION_ID})
+
+    # Vote: columna election_id e índices con la elección al frente
+    votes = Vote.__table__
+    _add_column(conn, votes, votes.c.election_id)
+    conn.execute(votes.update().where(votes.c.election_id.is_(None)).values(election_id=DEFAULT_ELECTION_ID))
+    conn.execute(text('DROP INDEX IF EXISTS ix_vote_vote_content'))
+    conn.execute(text('DROP INDEX IF EXISTS ix_vote_merkle_index'))
+    for name in ('ix_vote_election', 'ix_vote_election_content', 'ix_vote_election_merkle'):
+        _create_named_index(conn, votes, name)
+
+    # Las filas únicas (id=1) de versión y estado del árbol pasan a ser de la elección general
+    for table in (TallyVersion.__table__, MerkleState.__table__):
+        if 'id' in _columns(conn, table):
+            conn.execute(text(f'ALTER TABLE "{table.name}" RENAME COLUMN id TO election_id'))
+
+    # Tally y MerkleNode cambian de llave primaria: SQLite obliga a recrear la tabla
+    if 'election_id' not in _columns(conn, Tally.__table__):
+        conn.execute(text('DROP TABLE tally'))
+        Tally.__table__.create(conn)
+        conn.execute(text(
+            'INSERT INTO tally (election_id, candidate, count) '
+            'SELECT election_id, vote_content, COUNT(*) FROM vote GROUP BY election_id, vote_content'
+        ))
+    if 'election_id' not in _columns(conn, MerkleNode.__table__):
+        conn.execute(text('ALTER TABLE merkle_node RENAME TO merkle_node_old'))
+        MerkleNode.__table__.create(conn)
+        conn.execute(text(
+            'INSERT INTO merkle_node (election_id, level, position, digest) '
+            'SELECT :election, level, position, digest FROM merkle_node_old'
+        ), {'election': DEFAULT_ELECTION_ID})
+        conn.execute(text('DROP TABLE merkle_node_old'))
+
+
+def _hash_plaintext_passwords(conn):
+    """
+    Cuentas antiguas con la contraseña guardada en claro (sin '$'): se
+    reemplaza por su hash PBKDF2. Al entrar se recalcula si el esquema o costo
+    configurado es otro; el login nunca acepta una contraseña en claro.
+    """
+    users = User.__table__
+    rows = conn.execute(
+        users.select().with_only_columns(users.c.id, users.c.password)
+        .where(users.c.password.not_like('%$%'))
+    ).all()
+    method = f"pbkdf2:sha256:{DEFAULT_COST['pbkdf2']}"
+    for user_id, password in rows:
+        conn.execute(users.update().where(users.c.id == user_id)
+                     .values(password=generate_password_hash(password, method=method)))
+
+
+MIGRATIONS = [
+    _create_indexes,
+    _add_pubkey_fingerprint,
+    _add_ballot_serials,
+    _binary_signatures,
+    _merkle_accumulator,
+    _multiple_elections,
+    _hash_plaintext_passwords,
+]
+
+
+def schema_version(conn):
+    return conn.execute(text('PRAGMA user_version')).scalar()
+
+
+def apply_migrations():
+    """Aplica las migraciones pendientes; devuelve cuántas se aplicaron"""
+    applied = 0
+    with db.engine.begin() as conn:
+        version = schema_version(conn)
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(text(f'PRAGMA user_version = {number}'))
+            applied += 1
+    return applied
@@ -1,17 +1,107 @@
+import json
+
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+# Firmas RSA-2048 guardadas en binario big-endian de ancho fijo
+SIGNATURE_BYTES = 256
+
+# Elección a la que pertenecen los votos anteriores a tener varias elecciones
+DEFAULT_ELECTION_ID = 1
+
+class Election(db.Model):
+    # Cada elección tiene su propia llave de firma (ver elections.py) y sus candidatos
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(50), unique=True, nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    candidates = db.Column(db.Text, nullable=False)  # Lista JSON
+
+    @property
+    def candidate_list(self):
+        return json.loads(self.candidates)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False) # En prod: usar HASH
     # Guardamos la llave pública del usuario como registro
     public_key_pem = db.Column(db.Text, nullable=False)
-    # CRÍTICO: Bandera para asegurar un solo voto
-    has_voted = db.Column(db.Boolean, default=False)
+    # SHA-256 de (n, e): autenticar la llave es comparar 32 bytes indexados
+    pubkey_fingerprint = db.Column(db.LargeBinary(32), unique=True, index=True)
+    # Legado (solo la elección general): el voto único ahora lo asegura ElectionVoter
+    has_voted = db.Column(db.Boolean, default=False, index=True)
+
+class ElectionVoter(db.Model):
+    # CRÍTICO: conjunto de votantes de cada elección; la llave primaria
+    # impide que el mismo usuario vote dos veces en la misma elección
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
 
 class Vote(db.Model):
+    # Índices con la elección al frente: cada elección ocupa su propio rango
+    # contiguo y las consultas de una no recorren las entradas de otra
+    __table_args__ = (
+        db.Index('ix_vote_election', 'election_id'),
+        db.Index('ix_vote_election_content', 'election_id', 'vote_content'),
+        db.Index('ix_vote_election_merkle', 'election_id', 'merkle_index', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False, default=DEFAULT_ELECTION_ID)
     vote_content = db.Column(db.String(100), nullable=False)
-    signature = db.Column(db.String(1000), nullable=False) # Firma RSA del Admin
\ No newline at end of file
+    signature = db.Column(db.LargeBinary(SIGNATURE_BYTES), nullable=False) # Firma RSA del Admin (binario)
+    # Número de serie de la boleta; forma parte del mensaje firmado (NULL en votos antiguos)
+    nonce = db.Column(db.String(64))
+    # Índice de firmas gastadas: la misma firma no puede depositarse dos veces
+    signature_hash = db.Column(db.LargeBinary(32), unique=True, index=True)
+    # Posición del voto como hoja del árbol de Merkle de su elección (ver merkle.py)
+    merkle_index = db.Column(db.Integer)
+
+    @staticmethod
+    def pack_signature(signature):
+        """Entero -> 256 bytes big-endian (lo que se guarda en la columna)"""
+        return int(signature).to_bytes(SIGNATURE_BYTES, 'big')
+
+    @property
+    def signature_int(self):
+        return int.from_bytes(self.signature, 'big')
+
+    @property
+    def signature_str(self):
+        """Firma en decimal, como aparece en el recibo del votante"""
+        return str(self.signature_int)
+
+class PooledKey(db.Model):
+    # Par de llaves pre-generado para /register; la privada va cifrada (AES-GCM)
+    id = db.Column(db.Integer, primary_key=True)
+    private_blob = db.Column(db.LargeBinary, nullable=False)
+    public_key_pem = db.Column(db.Text, nullable=False)
+    pubkey_fingerprint = db.Column(db.LargeBinary(32), nullable=False)
+
+class Tally(db.Model):
+    # Conteo acumulado por (elección, candidato); se actualiza en la misma
+    # transacción que cada voto, así /results no necesita recorrer la tabla Vote.
+    election_id = db.Column(db.Integer, primary_key=True)
+    candidate = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class TallyVersion(db.Model):
+    # Una fila por elección que cambia con cada voto: invalida las cachés de conteo
+    election_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class MerkleNode(db.Model):
+    # Raíz de un subárbol perfecto ya cerrado: nivel 0 son las hojas.
+    # Nunca cambian una vez escritos; con ellos se arman las pruebas de inclusión.
+    election_id = db.Column(db.Integer, primary_key=True)
+    level = db.Column(db.Integer, primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.LargeBinary(32), nullable=False)
+
+class MerkleState(db.Model):
+    # Una fila por elección: número de hojas, frontera (raíces de los subárboles
+    # perfectos concatenadas, el más grande primero) y la raíz publicada
+    election_id = db.Column(db.Integer, primary_key=True)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    frontier = db.Column(db.LargeBinary, nullable=False, default=b'')
+    root = db.Column(db.LargeBinary(32), nullable=False)
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Hash de contraseñas fuera de los hilos de request.
+
+pbkdf2/scrypt/argon2 son lentos a propósito; correrlos dentro del request
+deja al hilo ocupado con CPU (y con el GIL) antes siquiera de llegar a la
+parte RSA. Aquí se mandan a un pool de procesos acotado y el request solo
+espera el resultado.
+
+Esquemas soportados (costo configurable):
+    pbkdf2  -> iteraciones de PBKDF2-SHA256 (formato de werkzeug)
+    scrypt  -> N de scrypt, con r=8 y p=1 (formato de werkzeug)
+    argon2  -> time_cost de Argon2id; requiere el paquete opcional argon2-cffi
+
+Al verificar se indica si el hash guardado usa otro esquema o costo que el
+configurado, para recalcularlo en ese momento (rehash-on-login).
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+import os
+import threading
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+try:
+    from argon2 import PasswordHasher as Argon2Hasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+except ImportError:  # argon2-cffi es opcional
+    Argon2Hasher = None
+
+DEFAULT_COST = {
+    'pbkdf2': 1000000,
+    'scrypt': 2 ** 15,
+    'argon2': 3,
+}
+
+
+class PasswordPoolBusy(Exception):
+    """Hay demasiadas contraseñas esperando turno; el llamador debe reintentar."""
+
+
+def _werkzeug_method(backend, cost):
+    if backend == 'pbkdf2':
+        return f'pbkdf2:sha256:{cost}'
+    return f'scrypt:{cost}:8:1'
+
+
+# --- Funciones que corren en los procesos del pool ---
+
+def _hash(password, backend, cost):
+    if backend == 'argon2':
+        return Argon2Hasher(time_cost=cost).hash(password)
+    return generate_password_hash(password, method=_werkzeug_method(backend, cost))
+
+
+def _verify(stored, password, backend, cost):
+    """Devuelve (contraseña_correcta, requiere_rehash)"""
+    if stored.startswith('$argon2'):
+        if Argon2Hasher is None:
+            return False, False
+        hasher = Argon2Hasher(time_cost=cost if backend == 'argon2' else DEFAULT_COST['argon2'])
+        try:
+            hasher.verify(stored, password)
+        except (InvalidHashError, VerificationError):
+            return False, False
+        return True, backend != 'argon2' or hasher.check_needs_rehash(stored)
+
+    if '$' not in stored:
+        # No es un hash (p. ej. una contraseña en claro que no pasó por la
+        # migración _hash_plaintext_passwords): nunca se acepta
+        return False, False
+
+    if not check_password_hash(stored, password):
+        return False, False
+    if backend == 'argon2':
+        return True, True
+    return True, stored.split('$', 1)[0] != _werkzeug_method(backend, cost)
+
+
+class PasswordHasher:
+    def __init__(self, backend='pbkdf2', cost=None, workers=None, max_pending=64, timeout=30):
+        if backend not in DEFAULT_COST:
+            raise ValueError(f"Esquema de contraseñas desconocido: {backend}")
+        if backend == 'argon2' and Argon2Hasher is None:
+            raise ValueError("El esquema 'argon2' requiere el paquete argon2-cffi.")
+        self.backend = backend
+        self.cost = cost or DEFAULT_COST[backend]
+        self.timeout = timeout
+        self.workers = 1 if workers == 0 else workers or os.cpu_count()
+        self._hash_seconds = None
+        # Límite de contraseñas en vuelo: más allá de eso se rechaza en vez de encolar sin fin
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # workers=0: sin pool, todo en el hilo que llama (útil en pruebas)
+        self._executor = None if workers == 0 else ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+
+    def _submit(self, func, *args):
+        if self._executor is None:
+            future = Future()
+            future.set_result(func(*args))
+            return future
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordPoolBusy('Demasiadas contraseñas pendientes.')
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        return self._submit(_hash, password, self.backend, self.cost).result()
+
+    def hash_many(self, passwords):
+        futures = [self._submit(_hash, password, self.backend, self.cost) for password in passwords]
+        return [future.result() for future in futures]
+
+    def verify(self, stored, password):
+        """(correcta, requiere_rehash) para un hash guardado"""
+        return self._submit(_verify, stored, password, self.backend, self.cost).result()
+
+    def verify_many(self, pairs):
+        """Verifica [(hash_guardado, contraseña), ...] en paralelo, en el mismo orden"""
+        futures = [self._submit(_verify, stored, password, self.backend, self.cost)
+                   for stored, password in pairs]
+        return [future.result() for future in futures]
+
+    def hash_seconds(self):
+        """Segundos que tarda un hash con el esquema y costo configurados (se mide una vez)"""
+        if self._hash_seconds is None:
+            start = time.perf_counter()
+            _hash('calibracion', self.backend, self.cost)
+            self._hash_seconds = time.perf_counter() - start
+        return self._hash_seconds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
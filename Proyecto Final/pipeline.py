@@ -0,0 +1,166 @@
+"""
+Depósito de votos en la urna.
+
+deposit_ballot() marca al usuario como votante de la elección y guarda su
+voto en una sola transacción. VoteWriter es el modo "pipeline": los requests encolan votos ya
+validados y un hilo escritor los guarda por lotes con un solo commit
+(group commit). Cada request recibe su respuesta hasta que el commit de su
+lote terminó, así ningún voto se confirma antes de llegar a disco.
+"""
+from concurrent.futures import Future
+import queue
+import threading
+
+from sqlalchemy import text, update
+from sqlalchemy.dialects.sqlite import insert
+
+from crypto_utils import signature_digest
+from merkle import append_leaf, ballot_leaf
+from models import db, ElectionVoter, Vote
+from tally import record_vote
+
+
+class PipelineFull(Exception):
+    """La cola de votos está llena; el llamador debe reintentar más tarde."""
+
+
+class PipelineTimeout(Exception):
+    """
+    El lote del voto no terminó a tiempo (o su escritura falló). El voto puede
+    seguir en la cola y quedar guardado después: el votante debe buscar su
+    recibo antes de reintentar.
+    """
+
+
+def has_voted(election_id, user_id):
+    return db.session.get(ElectionVoter, (election_id, user_id)) is not None
+
+
+def claim_voter(election_id, user_id):
+    """
+    Marca al usuario como votante de la elección (sin commit). Devuelve False
+    si ya había votado. La llave primaria (elección, usuario) hace que solo
+    una transacción pueda insertar la fila.
+    """
+    marked = db.session.execute(
+        insert(ElectionVoter)
+        .values(election_id=election_id, user_id=user_id)
+        .on_conflict_do_nothing()
+    )
+    return marked.rowcount == 1
+
+
+def deposit_ballot(election_id, user_id, vote_content, signature, nonce):
+    """
+    Marca al usuario y agrega su voto a la sesión (sin commit).
+    'signature' es el entero de la firma. Con user_id=None el voto es anónimo (flujo de /vote): el usuario ya se
+    marcó al pedir la firma ciega. Devuelve el id del voto, o None si el
+    usuario ya había votado o si la firma ya estaba en la urna.
+    """
+    if user_id is not None and not claim_voter(election_id, user_id):
+        return None
+
+    # El índice único sobre signature_hash rechaza la firma repetida en O(log n)
+    # y sin carreras entre workers: ON CONFLICT DO NOTHING no inserta nada.
+    inserted = db.session.execute(
+        insert(Vote)
+        .values(election_id=election_id, vote_content=vote_content, signature=Vote.pack_signature(signature), nonce=nonce,
+                signature_hash=signature_digest(signature))
+        .on_conflict_do_nothing(index_elements=[Vote.signature_hash])
+    )
+    if inserted.rowcount == 0:
+        return None
+    vote_id = inserted.inserted_primary_key[0]
+
+    # El INSERT ya tomó el candado de escritura: el árbol no cambia debajo de nosotros
+    leaf_index = append_leaf(election_id, ballot_leaf(vote_content, nonce, signature))
+    db.session.execute(update(Vote).where(Vote.id == vote_id).values(merkle_index=leaf_index))
+
+    record_vote(election_id, vote_content)
+    return vote_id
+
+
+class VoteWriter:
+    """Hilo escritor que guarda los votos encolados por lotes."""
+
+    def __init__(self, app, batch_size=256, max_queue=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.batches = 0
+        self.ballots = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name='vote-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, election_id, user_id, vote_content, signature, nonce):
+        """
+        Encola un voto validado. Devuelve un Future que se resuelve con el id
+        del voto o None (igual que deposit_ballot) después del commit de su lote.
+        """
+        future = Future()
+        try:
+            self._queue.put_nowait((election_id, user_id, vote_content, signature, nonce, future))
+        except queue.Full:
+            raise PipelineFull('La cola de votos está llena.')
+        return future
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                stop = False
+                # Todo lo que llegó mientras se hacía el commit anterior va en este lote
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._write(batch)
+                if stop:
+                    return
+
+    def _write(self, batch):
+        try:
+            # Un solo commit para todo el lote, aunque mezcle elecciones. El candado de
+            # escritura se toma al inicio: si no se consigue, falla el lote completo sin
+            # haber escrito nada. (pysqlite no abre la transacción antes de un SAVEPOINT.)
+            db.session.execute(text('BEGIN IMMEDIATE'))
+            vote_ids = []
+            for election_id, user_id, content, signature, nonce, _ in batch:
+                # Cada voto en su SAVEPOINT: si uno falla, solo se deshace ese
+                try:
+                    with db.session.begin_nested():
+                        vote_ids.append(deposit_ballot(election_id, user_id, content, signature, nonce))
+                except Exception as exc:
+                    vote_ids.append(exc)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            for *_, future in batch:
+                future.set_exception(exc)
+            return
+        finally:
+            db.session.remove()
+
+        self.batches += 1
+        self.ballots += len(batch)
+        for vote_id, (*_, future) in zip(vote_ids, batch):
+            if isinstance(vote_id, Exception):
+                future.set_exception(vote_id)
+            else:
+                future.set_result(vote_id)
+
+    def stop(self):
+        """Guarda lo pendiente y detiene el hilo escritor"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'batches': self.batches, 'ballots': self.ballots}
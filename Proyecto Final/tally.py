@@ -0,0 +1,87 @@
+"""
+Conteo incremental de votos.
+
+Cada voto suma 1 a su candidato en la tabla Tally dentro de la misma
+transacción en que se inserta el Vote. /results solo lee Tally (una fila por
+candidato) y además lo guarda en una caché de proceso que se invalida cuando
+cambia TallyVersion. Conteo, versión y caché van por elección: los votos de
+una elección no tocan las filas ni invalidan la caché de las demás.
+"""
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, Vote, Tally, TallyVersion
+
+_cache_lock = threading.Lock()
+_cache = {}  # election_id -> (versión, labels, values)
+
+
+def _bump_version(election_id):
+    stmt = insert(TallyVersion).values(election_id=election_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TallyVersion.election_id],
+        set_={'version': TallyVersion.version + 1},
+    )
+    db.session.execute(stmt)
+
+
+def record_vote(election_id, candidate, amount=1):
+    """
+    Suma 'amount' votos al candidato. No hace commit: el llamador lo hace
+    junto con el insert del Vote para que conteo y urna nunca difieran.
+    """
+    stmt = insert(Tally).values(election_id=election_id, candidate=candidate, count=amount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Tally.election_id, Tally.candidate],
+        set_={'count': Tally.count + amount},
+    )
+    db.session.execute(stmt)
+    _bump_version(election_id)
+
+
+def current_version(election_id):
+    return db.session.query(TallyVersion.version).filter_by(election_id=election_id).scalar() or 0
+
+
+def get_tally(election_id):
+    """Devuelve (labels, values) para la gráfica; costo O(#candidatos)"""
+    version = current_version(election_id)
+    with _cache_lock:
+        cached = _cache.get(election_id)
+        if cached and cached[0] == version:
+            return list(cached[1]), list(cached[2])
+
+    rows = (db.session.query(Tally.candidate, Tally.count)
+            .filter_by(election_id=election_id)
+            .order_by(Tally.candidate)
+            .all())
+    labels = [candidate for candidate, _ in rows]
+    values = [count for _, count in rows]
+    with _cache_lock:
+        _cache[election_id] = (version, labels, values)
+    return list(labels), list(values)
+
+
+def rebuild_tally():
+    """
+    Reconstruye Tally desde cero a partir de la tabla Vote.
+    Devuelve {(elección, candidato): (conteo_anterior, conteo_real)} de los que no cuadraban.
+    """
+    previous = {(election_id, candidate): count for election_id, candidate, count
+                in db.session.query(Tally.election_id, Tally.candidate, Tally.count)}
+    counts = (db.session.query(Vote.election_id, Vote.vote_content, func.count(Vote.id))
+              .group_by(Vote.election_id, Vote.vote_content)
+              .all())
+    db.session.query(Tally).delete()
+    db.session.add_all(Tally(election_id=election_id, candidate=candidate, count=count)
+                       for election_id, candidate, count in counts)
+    for election_id in {key[0] for key in previous} | {row[0] for row in counts}:
+        _bump_version(election_id)
+    db.session.commit()
+
+    actual = {(election_id, candidate): count for election_id, candidate, count in counts}
+    return {key: (previous.get(key, 0), actual.get(key, 0))
+            for key in previous.keys() | actual.keys()
+            if previous.get(key, 0) != actual.get(key, 0)}
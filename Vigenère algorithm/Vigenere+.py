@@ -29,8 +29,16 @@ En esta implementación:
       la longitud probable de la clave.
     * El análisis de frecuencias con chi-cuadrado, donde comparamos el resultado
       de cada hipótesis con las frecuencias esperadas en español.
+    * El índice de coincidencia de cada longitud posible, que calculamos con
+      una matriz de conteos por columna sin descifrar el texto. Con él
+      ordenamos las longitudes que se prueban junto a las de Kasiski.
 """
 
+try:
+    import numpy as np
+except ImportError:  # Sin NumPy usamos el recorrido carácter por carácter
+    np = None
+
 MAX_LENGTH = 100000  # Límite informativo de longitud de texto
 
 # ---------------------------------------------------------------------------
@@ -100,25 +108,79 @@ def normaliza_clave(clave):
 # Implementación del cifrado y descifrado de Vigenère
 # ===========================================================================
 
-def vigenere_cifra(texto, clave):
+# ---------------------------------------------------------------------------
+# Tablas para la versión vectorizada. Vemos el texto como un arreglo de puntos
+# de código; todas las letras del alfabeto están por debajo de 256.
+# TABLA_BASE da el índice de cada letra (0..26 en minúsculas, 54..80 en
+# mayúsculas) o -1; TABLA_SALIDA regresa de índice + desplazamiento (que puede
+# pasar de 26) a la letra, con lo que el módulo 27 y la conservación de
+# mayúsculas quedan en una sola búsqueda.
+# ---------------------------------------------------------------------------
+
+if np is not None:
+    TABLA_BASE = np.full(256, -1, dtype=np.int16)
+    TABLA_SALIDA = np.zeros(4 * LONGITUD_ALFABETO, dtype=np.uint32)
+    for _i, (_may, _min) in enumerate(zip(ALFABETO_MAY, ALFABETO_MIN)):
+        TABLA_BASE[ord(_min)] = _i
+        TABLA_BASE[ord(_may)] = 2 * LONGITUD_ALFABETO + _i
+        for _vuelta in (0, LONGITUD_ALFABETO):
+            TABLA_SALIDA[_i + _vuelta] = ord(_min)
+            TABLA_SALIDA[2 * LONGITUD_ALFABETO + _i + _vuelta] = ord(_may)
+
+def vigenere_aplica_numpy(texto, claveN, signo, inicio=0):
     """
-    Ciframos el texto con el algoritmo de Vigenère.
-    - Usamos módulo 27.
-    - Avanzamos sobre la clave únicamente en las letras (ignoramos espacios o signos).
+    Misma operación que vigenere_aplica, pero sobre arreglos de NumPy:
+    - Pasamos el texto a índices del alfabeto con una tabla de búsqueda.
+    - Armamos la secuencia de la clave, que solo avanza en las letras,
+      repitiendo la clave (ya rotada a 'inicio') tantas veces como haga falta.
+    - Sumamos el desplazamiento a todas las letras en una sola operación
+      (descifrar es sumar 27 - k) y regresamos a texto con otra tabla.
     """
-    claveN = normaliza_clave(clave)
+    codigos = np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32).copy()
+    # Los puntos de código >= 256 se acotan a 255 ('ÿ'), que tampoco es letra
+    bases = TABLA_BASE.take(np.minimum(codigos, 255))
+    letras = bases >= 0
+    total = int(np.count_nonzero(letras))
+    if total == 0:
+        return texto, inicio
+
+    m = len(claveN)
+    clave = np.array([ALFABETO_MAY.index(c) for c in claveN], dtype=np.int16)
+    if signo < 0:
+        clave = (LONGITUD_ALFABETO - clave) % LONGITUD_ALFABETO
+    clave = np.roll(clave, -(inicio % m))
+    desplazamientos = np.tile(clave, total // m + 1)[:total]
+    codigos[letras] = TABLA_SALIDA.take(bases[letras] + desplazamientos)
+    return codigos.tobytes().decode('utf-32-le'), inicio + total
+
+def vigenere_aplica(texto, claveN, signo, inicio=0):
+    """
+    Sumamos (signo=1) o restamos (signo=-1) la clave normalizada 'claveN' al texto.
+    'inicio' es la posición de la clave en la que empezamos; devolvemos el texto
+    resultante y la posición siguiente, para poder continuar en otro bloque.
+    """
+    if np is not None:
+        return vigenere_aplica_numpy(texto, claveN, signo, inicio)
     resultado = []
-    j = 0
+    j = inicio
     for ch in texto:
         idx = codificar_caracter(ch)
         if idx == -1:
             resultado.append(ch)
             continue
         k = ALFABETO_MAY.index(claveN[j % len(claveN)])
-        nueva = (idx + k) % LONGITUD_ALFABETO
+        nueva = (idx + signo * k) % LONGITUD_ALFABETO
         resultado.append(decodificar_posicion(nueva, ch in ALFABETO_MAY))
         j += 1
-    return ''.join(resultado)
+    return ''.join(resultado), j
+
+def vigenere_cifra(texto, clave):
+    """
+    Ciframos el texto con el algoritmo de Vigenère.
+    - Usamos módulo 27.
+    - Avanzamos sobre la clave únicamente en las letras (ignoramos espacios o signos).
+    """
+    return vigenere_aplica(texto, normaliza_clave(clave), 1)[0]
 
 def vigenere_descifra(texto, clave):
     """
@@ -126,169 +188,292 @@ def vigenere_descifra(texto, clave):
     - Restamos el desplazamiento en módulo 27.
     - Conservamos mayúsculas y minúsculas.
     """
+    return vigenere_aplica(texto, normaliza_clave(clave), -1)[0]
+
+def vigenere_flujo(bloques, clave, signo):
+    """
+    Ciframos o desciframos un texto que llega por bloques (ver flujo.py).
+    Llevamos la posición de la clave de un bloque al siguiente, así que el
+    resultado es el mismo que procesar todo el texto de una sola vez.
+    """
     claveN = normaliza_clave(clave)
-    resultado = []
     j = 0
-    for ch in texto:
-        idx = codificar_caracter(ch)
-        if idx == -1:
-            resultado.append(ch)
-            continue
-        k = ALFABETO_MAY.index(claveN[j % len(claveN)])
-        nueva = (idx - k) % LONGITUD_ALFABETO
-        resultado.append(decodificar_posicion(nueva, ch in ALFABETO_MAY))
-        j += 1
-    return ''.join(resultado)
+    for bloque in bloques:
+        salida, j = vigenere_aplica(bloque, claveN, signo, j)
+        yield salida
+
+def vigenere_cifra_flujo(bloques, clave):
+    return vigenere_flujo(bloques, clave, 1)
+
+def vigenere_descifra_flujo(bloques, clave):
+    return vigenere_flujo(bloques, clave, -1)
 
 # ===========================================================================
 # Análisis de Kasiski y frecuencias (ataque)
 # ===========================================================================
 
 from collections import defaultdict, Counter
+import re
+
+LONGITUD_CLAVE_MAX_KASISKI = 20  # Solo contamos divisores entre 2 y este valor
 
 def solo_letras_es(texto):
     """
     Extraemos únicamente las letras válidas (de nuestro alfabeto).
     Convertimos todo a mayúsculas para simplificar los cálculos.
     """
-    res = []
-    for ch in texto:
-        if ch in ALFABETO_MAY:
-            res.append(ch)
-        elif ch in ALFABETO_MIN:
-            res.append(ch.upper())
-    return ''.join(res)
+    return re.sub('[^A-Za-zÑñ]+', '', texto).upper()
 
 def encuentra_repeticiones(texto, min_len=3, max_len=5):
     """
-    Buscamos repeticiones de substrings de longitud entre min_len y max_len.
+    Buscamos repeticiones de substrings de longitud entre min_len y max_len
+    (max_len=None: de cualquier longitud, hasta que ya no haya repeticiones).
     Calculamos las distancias entre apariciones consecutivas de esos substrings.
     """
+    if np is not None:
+        return encuentra_repeticiones_numpy(texto, min_len, max_len).tolist()
     distancias = []
-    for L in range(min_len, max_len+1):
+    L = min_len
+    while max_len is None or L <= max_len:
         posiciones = defaultdict(list)
         for i in range(0, len(texto)-L+1):
             sub = texto[i:i+L]
             posiciones[sub].append(i)
+        repetidos = False
         for inds in posiciones.values():
             if len(inds) >= 2:
+                repetidos = True
                 for a, b in zip(inds, inds[1:]):
                     distancias.append(b - a)
+        if not repetidos:
+            break  # Si nada de longitud L se repite, nada más largo se repite
+        L += 1
     return distancias
 
-def factores(n):
+def encuentra_repeticiones_numpy(texto, min_len=3, max_len=5):
+    """
+    Mismas distancias (y en el mismo orden) que encuentra_repeticiones, como
+    arreglo de NumPy y sin cortar substrings. Agrupamos las posiciones por el substring de longitud L
+    que empieza en ellas, como lo haría el arreglo de sufijos: el grupo de
+    longitud L sale del grupo de longitud L-1 más la letra siguiente, y solo
+    seguimos con las posiciones cuyo grupo tiene al menos dos elementos.
+    Cada longitud cuesta O(k log k) sobre las k posiciones que aún se repiten.
+    """
+    codigos = np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32)
+    n = len(codigos)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    simbolos, letras = np.unique(codigos, return_inverse=True)
+    letras = letras.astype(np.int64)
+    posiciones = np.arange(n)
+    grupos = letras
+    distancias = []
+    L = 1
+    while posiciones.size and (max_len is None or L <= max_len):
+        if L > 1:
+            cabe = posiciones <= n - L
+            posiciones, grupos = posiciones[cabe], grupos[cabe]
+            llave = grupos * len(simbolos) + letras[posiciones + L - 1]
+            _, grupos = np.unique(llave, return_inverse=True)
+        # Descartamos las posiciones cuyo substring no se repite
+        conteo = np.bincount(grupos)
+        repetidas = conteo[grupos] >= 2
+        posiciones, grupos = posiciones[repetidas], grupos[repetidas]
+        if L >= min_len and posiciones.size:
+            distancias.append(_distancias_consecutivas(posiciones, grupos))
+        L += 1
+    return np.concatenate(distancias) if distancias else np.zeros(0, dtype=np.int64)
+
+def _distancias_consecutivas(posiciones, grupos):
     """
-    Calculamos los factores mayores que 1 de un número n.
-    Usamos esto para deducir longitudes posibles de la clave.
+    Distancias entre apariciones consecutivas de cada grupo, ordenadas como en
+    el diccionario de encuentra_repeticiones: por la primera aparición del
+    substring y luego por posición.
     """
-    facs = set()
-    for i in range(2, int(n**0.5)+1):
-        if n % i == 0:
-            facs.add(i)
-            facs.add(n//i)
-    if n > 1:
-        facs.add(n)
-    return sorted(facs)
+    orden = np.argsort(grupos, kind='stable')  # 'posiciones' ya va en orden
+    pos, grp = posiciones[orden], grupos[orden]
+    mismo = grp[1:] == grp[:-1]
+    inicio_grupo = np.maximum.accumulate(np.where(np.r_[True, ~mismo], np.arange(len(pos)), 0))
+    primera = pos[inicio_grupo][:-1][mismo]
+    anterior = pos[:-1][mismo]
+    distancias = (pos[1:] - pos[:-1])[mismo]
+    return distancias[np.lexsort((anterior, primera))]
 
 def candidatos_longitud_clave_por_kasiski(texto):
     """
     Aplicamos el método de Kasiski:
     - Encontramos distancias entre repeticiones.
-    - Calculamos factores comunes.
+    - Contamos cuántas distancias divide cada longitud posible (2..20); no
+      hace falta factorizar las distancias completas.
     - Proponemos longitudes de clave más probables.
     """
     letras = solo_letras_es(texto)
-    dists = encuentra_repeticiones(letras, 3, 5)
-    if not dists:
+    longitudes = range(2, LONGITUD_CLAVE_MAX_KASISKI + 1)
+    if np is None:
+        dists = encuentra_repeticiones(letras, 3, 5)
+        conteo = Counter()
+        for d in dists:
+            for f in longitudes:
+                if d % f == 0:
+                    conteo[f] += 1
+        return [k for k, _ in conteo.most_common(10)]
+    # Mismo orden que Counter.most_common: más distancias primero y, en empate,
+    # la longitud que apareció antes (primera distancia que divide; luego la menor)
+    dists = encuentra_repeticiones_numpy(letras, 3, 5)
+    ranking = []
+    for f in longitudes:
+        divide = dists % f == 0
+        cuantas = int(np.count_nonzero(divide))
+        if cuantas:
+            ranking.append((-cuantas, int(np.argmax(divide)), f))
+    ranking.sort()
+    return [f for _, _, f in ranking[:10]]
+
+# ===========================================================================
+# Longitud de clave por índice de coincidencia (sin descifrar)
+# ===========================================================================
+
+# Probabilidad de que dos letras al azar de un texto en español coincidan;
+# en un texto aleatorio sería 1/27
+IC_ESPANOL = sum((f / 100.0) ** 2 for f in FREC_ES.values())
+IC_ALEATORIO = 1.0 / LONGITUD_ALFABETO
+PERIODO_MAX_IC = 40
+FRACCION_MEJOR_IC = 0.9
+CANDIDATOS_IC = 3  # Longitudes por IC que se prueban junto a las de Kasiski
+
+POSICION_LETRA = {letra: i for i, letra in enumerate(ALFABETO_MAY)}
+
+def indices_letras(texto):
+    """Índices (0..26) de las letras del texto, como arreglo de NumPy (o lista sin NumPy)"""
+    if np is None:
+        return [POSICION_LETRA[c] for c in solo_letras_es(texto)]
+    codigos = np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32)
+    bases = TABLA_BASE.take(np.minimum(codigos, 255))
+    return (bases[bases >= 0] % (2 * LONGITUD_ALFABETO)).astype(np.int64)
+
+def matriz_frecuencias(indices, m):
+    """
+    Conteo de cada letra en cada una de las m columnas (la letra i cae en la
+    columna i mod m), en una matriz de m x 27. Con ella sacamos el índice de
+    coincidencia, la clave y el puntaje sin volver a armar columnas de texto.
+    """
+    if np is None:
+        conteos = [[0] * LONGITUD_ALFABETO for _ in range(m)]
+        for i, x in enumerate(indices):
+            conteos[i % m][x] += 1
+        return conteos
+    celdas = (np.arange(len(indices)) % m) * LONGITUD_ALFABETO + indices
+    return np.bincount(celdas, minlength=m * LONGITUD_ALFABETO).reshape(m, LONGITUD_ALFABETO)
+
+def indice_coincidencia(frecuencias):
+    """Índice de coincidencia promedio de las columnas de una matriz de frecuencias"""
+    if np is None:
+        ics = []
+        for fila in frecuencias:
+            n = sum(fila)
+            if n >= 2:
+                ics.append(sum(f * (f - 1) for f in fila) / (n * (n - 1)))
+        return sum(ics) / len(ics) if ics else 0.0
+    n = frecuencias.sum(axis=1)
+    validas = n >= 2
+    if not validas.any():
+        return 0.0
+    pares = (frecuencias * (frecuencias - 1)).sum(axis=1)
+    return float((pares[validas] / (n[validas] * (n[validas] - 1))).mean())
+
+def candidatos_longitud_clave_por_ic(cipher, max_periodo=PERIODO_MAX_IC, cuantos=10):
+    """
+    Ordenamos las longitudes 1..max_periodo sin descifrar nada:
+    - Con la longitud correcta (o un múltiplo) cada columna es un César y su
+      índice de coincidencia se acerca al del español; con otra, al aleatorio.
+    - Primero van, de menor a mayor, las que llegan al 90% del mejor IC (así
+      la clave gana a sus múltiplos, y a sus divisores que solo juntan
+      columnas parecidas), luego las demás por IC.
+    """
+    indices = indices_letras(cipher)
+    ics = []
+    for m in range(1, min(max_periodo, len(indices) // 2) + 1):
+        ics.append((m, indice_coincidencia(matriz_frecuencias(indices, m))))
+    if not ics:
         return []
-    conteo = Counter()
-    for d in dists:
-        for f in factores(d):
-            if 2 <= f <= 20:
-                conteo[f] += 1
-    return [k for k, _ in conteo.most_common(10)]
-
-def chi_cuadrado_columna(texto_col):
-    """
-    Calculamos el estadístico chi-cuadrado comparando frecuencias observadas
-    de una columna con las frecuencias esperadas en español.
-    Mientras más bajo sea el valor, más parecido es al idioma.
-    """
-    N = len(texto_col)
-    if N == 0: 
-        return float('inf')
-    obs = Counter(texto_col)
-    chi = 0.0
-    for letra in ALFABETO_MAY:
-        Ei = FREC_ES[letra] * N / 100.0
-        Oi = obs.get(letra, 0)
-        if Ei > 0:
-            chi += (Oi - Ei)**2 / Ei
-    return chi
-
-def mejor_desplazamiento_por_chi(columna):
-    """
-    Probamos todos los desplazamientos posibles en una columna
-    y escogemos aquel que produce el menor chi-cuadrado.
-    """
-    mejor_shift = 0
-    mejor_chi = float('inf')
-    for s in range(LONGITUD_ALFABETO):
-        desc = ''.join(ALFABETO_MAY[(ALFABETO_MAY.index(c) - s) % LONGITUD_ALFABETO] for c in columna)
-        chi = chi_cuadrado_columna(desc)
-        if chi < mejor_chi:
-            mejor_chi = chi
-            mejor_shift = s
-    return mejor_shift, mejor_chi
-
-def deduce_clave_por_frecuencias(cipher, m):
-    """
-    Dividimos el texto en m columnas y, para cada una, deducimos el mejor
-    desplazamiento por chi-cuadrado. Reconstruimos la clave estimada.
-    """
-    columnas = ['' for _ in range(m)]
-    solo = solo_letras_es(cipher)
-    for i, ch in enumerate(solo):
-        columnas[i % m] += ch
-    shifts = []
-    for col in columnas:
-        s, _ = mejor_desplazamiento_por_chi(col)
-        shifts.append(s)
-    clave = ''.join(ALFABETO_MAY[s] for s in shifts)
-    return clave
+    umbral = max(FRACCION_MEJOR_IC * max(ic for _, ic in ics), (IC_ESPANOL + IC_ALEATORIO) / 2)
+    arriba = [m for m, ic in ics if ic >= umbral]
+    abajo = [m for m, ic in sorted(ics, key=lambda x: -x[1]) if ic < umbral]
+    return (arriba + abajo)[:cuantos]
+
+# Desplazamientos de las 27 hipótesis: ROTACIONES[s, p] = (p + s) mod 27
+if np is not None:
+    ROTACIONES = (np.arange(LONGITUD_ALFABETO)[:, None] + np.arange(LONGITUD_ALFABETO)) % LONGITUD_ALFABETO
+    FREC_ES_ARREGLO = np.array([FREC_ES[letra] for letra in ALFABETO_MAY])
 
-def puntua_texto_chi(texto):
+def chi_cuadrado_conteos(conteos):
     """
-    Calculamos un puntaje chi-cuadrado global sobre todo el texto.
-    Esto nos sirve para comparar hipótesis de clave completas.
+    Estadístico chi-cuadrado de los conteos de letras (último eje de 27)
+    contra las frecuencias esperadas en español; menor es más parecido.
     """
-    plano = solo_letras_es(texto)
-    return chi_cuadrado_columna(plano)
+    if np is None:  # Una sola lista de 27 conteos
+        n = sum(conteos)
+        if n == 0:
+            return float('inf')
+        esperados = [FREC_ES[letra] * n / 100.0 for letra in ALFABETO_MAY]
+        return sum((o - e) ** 2 / e for o, e in zip(conteos, esperados))
+    n = conteos.sum(axis=-1, keepdims=True)
+    esperados = FREC_ES_ARREGLO * n / 100.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chi = ((conteos - esperados) ** 2 / esperados).sum(axis=-1)
+    return np.where(n[..., 0] > 0, chi, np.inf)
+
+def clave_por_matriz(frecuencias):
+    """
+    Para cada columna probamos los 27 desplazamientos a la vez (la columna
+    descifrada con s tiene, en la letra p, los conteos de la letra p + s) y
+    nos quedamos con el de menor chi-cuadrado. Devolvemos la clave y el
+    chi-cuadrado del texto completo ya descifrado, sin descifrarlo.
+    """
+    if np is None:
+        shifts = []
+        descifrado = [0] * LONGITUD_ALFABETO
+        for fila in frecuencias:
+            rotadas = [[fila[(p + s) % LONGITUD_ALFABETO] for p in range(LONGITUD_ALFABETO)]
+                       for s in range(LONGITUD_ALFABETO)]
+            chis = [chi_cuadrado_conteos(r) for r in rotadas]
+            s = chis.index(min(chis))
+            shifts.append(s)
+            descifrado = [a + b for a, b in zip(descifrado, rotadas[s])]
+        return ''.join(ALFABETO_MAY[s] for s in shifts), chi_cuadrado_conteos(descifrado)
+    chis = chi_cuadrado_conteos(frecuencias[:, ROTACIONES])  # columnas x desplazamientos
+    shifts = chis.argmin(axis=1)
+    descifrado = frecuencias[np.arange(len(shifts))[:, None], ROTACIONES[shifts]].sum(axis=0)
+    clave = ''.join(ALFABETO_MAY[s] for s in shifts)
+    return clave, float(chi_cuadrado_conteos(descifrado))
 
 def rompe_vigenere_kasiski_frecuencias(cipher):
     """
     Intentamos romper un texto cifrado con Vigenère:
-    1) Proponemos longitudes de clave con Kasiski.
+    1) Proponemos longitudes de clave con Kasiski y sumamos las
+       CANDIDATOS_IC mejor ordenadas por índice de coincidencia.
     2) Para cada longitud, deducimos una clave por frecuencias.
-    3) Desciframos y puntuamos con chi-cuadrado.
-    4) Elegimos el mejor resultado.
+    3) Puntuamos con chi-cuadrado el texto que daría esa clave.
+    4) Elegimos el mejor resultado y solo desciframos con esa clave.
+    Cada columna que ajustamos por separado baja el chi-cuadrado por puro
+    azar, así que al comparar longitudes le sumamos 26 (sus grados de
+    libertad) por columna: un múltiplo de la clave solo gana si de verdad
+    ajusta mejor. Con y sin NumPy seguimos los mismos pasos.
     """
-    candidatos = candidatos_longitud_clave_por_kasiski(cipher)
+    candidatos = []
+    for m in candidatos_longitud_clave_por_ic(cipher)[:CANDIDATOS_IC] + candidatos_longitud_clave_por_kasiski(cipher):
+        if m not in candidatos:
+            candidatos.append(m)
     if not candidatos:
         candidatos = list(range(2, 11))
+    indices = indices_letras(cipher)
     mejores = []
     for m in candidatos:
-        try:
-            clave_est = deduce_clave_por_frecuencias(cipher, m)
-            claro = vigenere_descifra(cipher, clave_est)
-            score = puntua_texto_chi(claro)
-            mejores.append((score, clave_est, claro))
-        except Exception:
-            continue
-    if not mejores:
-        raise ValueError("No fue posible deducir la clave/descifrado.")
-    mejores.sort(key=lambda x: x[0])
-    return mejores[0]
+        clave_est, score = clave_por_matriz(matriz_frecuencias(indices, m))
+        mejores.append((score + (LONGITUD_ALFABETO - 1) * m, m, score, clave_est))
+    # Sin letras todos los puntajes son infinitos: queda la clave 'AA' y el texto igual
+    _, _, score, clave_est = min(mejores)
+    return score, clave_est, vigenere_descifra(cipher, clave_est)
 
 # ===========================================================================
 # Menú 
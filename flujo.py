@@ -0,0 +1,187 @@
+# -------------------------------------------------------------
+# Nombre del programa: flujo.py
+# Descripción: Cifrado por bloques de archivos grandes con los cifrados clásicos
+# Autor(es):
+#    - Del Razo Sánchez Diego Adrián
+#    - Guadarrama Herrera Ken Bryan
+#    - Mendoza Espinosa Ricardo
+#    - Vázquez Cárdenas Josué
+#    - Villeda Tlecuitl José Eduardo
+#    - Zavala Mendoza Luis Enrique
+# Fecha de creación: 17/10/2026
+# Última modificación: 17/10/2026
+# Materia: Criptografía
+# Versión: 1.0
+# -------------------------------------------------------------
+
+"""
+Modo archivo para César, Vigenère, Vernam, Playfair (Wheatstone) y Hill.
+
+Los programas de cada carpeta leen una sola línea con input(). Aquí leemos
+un archivo (o la entrada estándar) en bloques de tamaño fijo, se los pasamos
+al cifrado como un generador y escribimos cada bloque en cuanto sale, así la
+memoria no depende del tamaño del archivo. El estado que cruza de un bloque
+a otro lo lleva cada cifrado:
+
+- Vigenère: la posición de la clave.
+- Playfair: la letra que quedó sin pareja.
+- Hill: las letras que no completaron un bloque de n.
+- Vernam: la clave, que se escribe (o se lee) en su propio archivo. Solo
+  las letras a-z (mayúsculas o minúsculas) usan clave; lo demás (ñ,
+  acentos, signos, saltos de línea) pasa igual.
+
+Ejemplos:
+
+    python flujo.py cesar cifrar --llave 3 -i claro.txt -o cifrado.txt
+    python flujo.py vigenere descifrar --clave LIMÓN < cifrado.txt
+    python flujo.py vernam cifrar --archivo-clave clave.txt -i claro.txt -o cifrado.txt
+    python flujo.py vernam descifrar --archivo-clave clave.txt -i cifrado.txt | cmp - claro.txt
+    python flujo.py playfair cifrar --clave monarquia -i claro.txt
+    python flujo.py hill cifrar --matriz "3 3 2 5" -i claro.txt
+"""
+
+import argparse
+import importlib.util
+import io
+import os
+import sys
+
+TAMANO_BLOQUE = 65536  # Caracteres por bloque
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+# Programa de cada cifrado (los nombres de carpeta y archivo no son importables)
+PROGRAMAS = {
+    'cesar': os.path.join('Caesar Cipher Algorithm', 'Caesar.py'),
+    'vigenere': os.path.join('Vigenère algorithm', 'Vigenere+.py'),
+    'vernam': os.path.join('Cifrado Verman', 'cifradoVerman.py'),
+    'playfair': os.path.join('Cifrado Wheatstone', 'Wheatstone.py'),
+    'hill': os.path.join('Hill Algorithm', 'hill.py'),
+}
+
+
+def cargar_cifrado(nombre):
+    """Importamos el programa de un cifrado a partir de su ruta"""
+    ruta = os.path.join(RAIZ, PROGRAMAS[nombre])
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+# ===========================================================================
+# Lectura y escritura por bloques
+# ===========================================================================
+
+def abrir_texto(ruta, modo):
+    """
+    Abrimos un archivo de texto UTF-8 ('-' es la entrada o salida estándar).
+    Con newline='' los saltos de línea pasan sin cambios.
+    """
+    if ruta == '-':
+        flujo = sys.stdin.buffer if modo == 'r' else sys.stdout.buffer
+        return io.TextIOWrapper(flujo, encoding='utf-8', newline='')
+    return open(ruta, modo, encoding='utf-8', newline='')
+
+
+def leer_bloques(archivo, tamano=TAMANO_BLOQUE):
+    """Generamos el contenido del archivo en bloques de 'tamano' caracteres"""
+    while True:
+        bloque = archivo.read(tamano)
+        if not bloque:
+            return
+        yield bloque
+
+
+def escribir_bloques(archivo, bloques):
+    for bloque in bloques:
+        archivo.write(bloque)
+    archivo.flush()
+
+
+def escribir_vernam(salida, archivo_clave, pares):
+    """Escribimos el texto cifrado y, aparte, la clave separada por comas"""
+    primero = True
+    for cifrado, clave in pares:
+        salida.write(cifrado)
+        if clave:
+            archivo_clave.write(('' if primero else ',') + ','.join(map(str, clave)))
+            primero = False
+    salida.flush()
+
+
+# ===========================================================================
+# Menú de línea de comandos
+# ===========================================================================
+
+def procesar(args, entrada, salida):
+    bloques = leer_bloques(entrada, args.bloque)
+    modulo = cargar_cifrado(args.cifrado)
+    cifrar = args.operacion == 'cifrar'
+
+    if args.cifrado == 'cesar':
+        funcion = modulo.cifrar_cesar_flujo if cifrar else modulo.descifrar_cesar_flujo
+        escribir_bloques(salida, funcion(bloques, args.llave))
+    elif args.cifrado == 'vigenere':
+        funcion = modulo.vigenere_cifra_flujo if cifrar else modulo.vigenere_descifra_flujo
+        escribir_bloques(salida, funcion(bloques, args.clave))
+    elif args.cifrado == 'playfair':
+        if not cifrar:
+            raise ValueError("El programa de Playfair solo implementa el cifrado.")
+        escribir_bloques(salida, modulo.cifrar_playfair_flujo(args.clave.lower(), bloques))
+    elif args.cifrado == 'hill':
+        elementos = list(map(int, args.matriz.split()))
+        n = int(round(len(elementos) ** 0.5))
+        if n < 2 or n * n != len(elementos):
+            raise ValueError("La matriz debe ser cuadrada, de dimensión 2 o mayor.")
+        matriz = modulo.np.array(elementos).reshape(n, n)
+        modulo.matrix_mod_inverse(matriz, 26)  # Validamos que sea invertible módulo 26
+        funcion = modulo.hill_encrypt_stream if cifrar else modulo.hill_decrypt_stream
+        escribir_bloques(salida, funcion(bloques, matriz))
+    elif cifrar:  # vernam
+        with open(args.archivo_clave, 'w') as archivo_clave:
+            escribir_vernam(salida, archivo_clave, modulo.cifrar_flujo(bloques))
+    else:
+        with open(args.archivo_clave, 'r') as archivo_clave:
+            claves = modulo.leer_clave(archivo_clave, args.bloque)
+            escribir_bloques(salida, modulo.descifrar_flujo(bloques, claves))
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Cifra o descifra archivos de cualquier tamaño por bloques.")
+    cifrados = parser.add_subparsers(dest='cifrado', required=True)
+
+    def agregar(nombre, ayuda):
+        sub = cifrados.add_parser(nombre, help=ayuda)
+        sub.add_argument('operacion', choices=('cifrar', 'descifrar'))
+        sub.add_argument('-i', '--entrada', default='-', help="Archivo de entrada ('-' = entrada estándar)")
+        sub.add_argument('-o', '--salida', default='-', help="Archivo de salida ('-' = salida estándar)")
+        sub.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help="Caracteres por bloque")
+        return sub
+
+    agregar('cesar', "Cifrado César (alfabeto español)").add_argument('--llave', type=int, required=True)
+    agregar('vigenere', "Cifrado de Vigenère (alfabeto español)").add_argument('--clave', required=True)
+    agregar('vernam', "Cifrado de Vernam").add_argument('--archivo-clave', required=True,
+                                                       help="Donde se guarda (cifrar) o se lee (descifrar) la clave")
+    agregar('playfair', "Cifrado Playfair / Wheatstone").add_argument('--clave', required=True)
+    agregar('hill', "Cifrado Hill").add_argument('--matriz', required=True,
+                                                 help="Elementos de la matriz fila por fila, ej. \"3 3 2 5\"")
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    if args.bloque < 1:
+        print("Error: El tamaño de bloque debe ser positivo.", file=sys.stderr)
+        return 1
+    try:
+        with abrir_texto(args.entrada, 'r') as entrada, abrir_texto(args.salida, 'w') as salida:
+            procesar(args, entrada, salida)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())